@@ -0,0 +1,65 @@
+import numpy as np
+
+
+def top_n_with_other(sales, n=5, column="Net Sales", other_label="Other"):
+    """Names and values of the ``n`` largest groups plus an "Other" bucket.
+
+    ``sales`` is a grouped frame such as ``rollup(cells, "Product Line")``.
+    The top groups are found with ``argpartition`` instead of sorting every
+    group, then only those ``n`` are ordered. "Other" holds the sum of the
+    remaining groups and is dropped when it is not above 10% of itself, as
+    the dashboard always did.
+    """
+    values = sales[column].to_numpy()
+    if len(values) > n:
+        top = np.argpartition(-values, n - 1)[:n]
+    else:
+        top = np.arange(len(values))
+    top = top[np.argsort(-values[top], kind="stable")]
+
+    rest = np.ones(len(values), dtype=bool)
+    rest[top] = False
+    other_sum = values[rest].sum()
+    threshold = other_sum * 0.1
+
+    names = sales.index[top].tolist()
+    top_values = values[top].tolist()
+    if other_sum > threshold:
+        names.append(other_label)
+        top_values.append(other_sum)
+    return names, top_values
+
+
+if __name__ == "__main__":
+    # partial selection vs the sort/isin block it replaces, on a high-cardinality column
+    import timeit
+
+    import pandas as pd
+
+    def sort_top_5(sales):
+        top_5 = sales.sort_values("Net Sales", ascending=False).iloc[:5]
+        others = sales.loc[~sales.index.isin(top_5.index)]
+        other_sum = others["Net Sales"].sum()
+        threshold = other_sum * 0.1
+
+        top_5_names = top_5.index.tolist()
+        top_5_names.append("Other")
+
+        top_5_values = top_5["Net Sales"].tolist()
+        if other_sum > threshold:
+            top_5_values.append(other_sum)
+        else:
+            top_5_names.pop()
+        return top_5_names, top_5_values
+
+    rng = np.random.default_rng(0)
+    for n_groups in (50, 5_000, 500_000):
+        sales = pd.DataFrame(
+            {"Net Sales": rng.gamma(2.0, 1000.0, n_groups)},
+            index=pd.Index([f"range {i}" for i in range(n_groups)], name="Product Range"),
+        )
+        assert top_n_with_other(sales)[0] == sort_top_5(sales)[0]
+        number = max(1, 200_000 // n_groups)
+        old = timeit.timeit(lambda: sort_top_5(sales), number=number) / number
+        new = timeit.timeit(lambda: top_n_with_other(sales), number=number) / number
+        print(f"{n_groups:>8,} groups   sort+isin {old * 1e3:8.3f} ms   argpartition {new * 1e3:8.3f} ms   {old / new:5.1f}x")
@@ -1,50 +1,39 @@
-import pickle
-from pathlib import Path
-
-import pandas as pd 
-import numpy as np
-import plotly.express as px 
 import streamlit as st  
-from PIL import Image
-import json
-from streamlit import components
-import streamlit.components.v1 as components_v1
-import html
-import fontawesome as fa
-import time
 
 import streamlit_authenticator as stauth
 
+from users import load_user_store
+
 st.set_page_config(page_title="Sales Dashboard", page_icon=":bar_chart:", layout="wide", initial_sidebar_state="collapsed")
 
 
 # --- USER AUTHENTICATION ---
-names = ["Soumaya Jendoubi", "Client X"]
-usernames = ["soumaya", "clientx"]
+# see the performance panel in the sidebar
+ADMIN_USERS = ["soumaya"]
 
-# load hashed passwords
-file_path = Path(__file__).parent / "hashed_pw.pkl"
-with file_path.open("rb") as file:
-    hashed_passwords = pickle.load(file)
+@st.cache_resource
+def get_user_store():
+    # users.db, opened once per process; add users with `python -m users provision users.csv`
+    return load_user_store()
 
-# my class function which makes a call to a database and returns a list of lists (nested list), of usernames, names, and passwords
-# users = user.get_all_users_credentials()
-# the code mentioned above
-# usernames = [user[1] for user in users]
-# names = [user[2] for user in users]
-passwords = hashed_passwords
+@st.cache_resource(max_entries=1)
+def get_credentials(version):
+    # every user in one query, once per process and again after `users provision`
+    # (keyed on the store version). Authenticate records logged_in/failed attempts
+    # on these entries, shared by the sessions like the config file it would write.
+    return get_user_store().credentials()
 
-credentials = {"usernames":{}}
+credentials = get_credentials(get_user_store().version())
 
-for un, name, pw in zip(usernames, names, passwords):
-    user_dict = {"name":name,"password":pw}
-    credentials["usernames"].update({un:user_dict})
-
-authenticator = stauth.Authenticate(credentials,  "sales_dashboard", "abcdef", cookie_expiry_days=30)
+# a new outer dict each rerun, Authenticate replaces its "usernames"; hashes stored, no auto-hashing
+authenticator = stauth.Authenticate({"usernames": credentials["usernames"]},  "sales_dashboard", "abcdef", cookie_expiry_days=30, auto_hash=False)
 
 # authenticator = stauth.Authenticate(names, usernames, hashed_passwords, "sales_dashboard", "abcdef", cookie_expiry_days=30)
 
-name, authentication_status, username = authenticator.login("Login", "main")
+authenticator.login(location="main")
+name = st.session_state["name"]
+authentication_status = st.session_state["authentication_status"]
+username = st.session_state["username"]
 
 if authentication_status == False:
     st.error("Username/password is incorrect")
@@ -53,49 +42,58 @@ if authentication_status == None:
     st.warning("Please enter your username and password")
 
 if authentication_status:
-    alert=st.warning(f"Welcome {name}")
-    time.sleep(5)
-    alert.empty()
-    @st.cache_data
-    def get_data_from_excel():
-        df = pd.read_excel(
-                io="data clean complete2.xlsx",
-                engine="openpyxl",
-                sheet_name="data",
-                skiprows=0,
-                usecols="A:N",
-                nrows=356639
-            )
-        return df
-
-    df = get_data_from_excel()
-
-    #rename companies
-    mapping = {'GPA': 'Company X1', 'CMS': 'Company X2', 'CAP': 'Company X3', 'ACS': 'Company X4'}
-    df['Company Name'] = df['Company Name'].replace(mapping)
+    # pandas, pyarrow and plotly come in with these, not on the login page
+    from dashboard import cached_view, load_sales
+    from figures import export_figures, local_figures, overall_figures
+    from geo import prepare_geojson
+    from timings import TIMINGS, span
+
+    TIMINGS.start_rerun()
+
+    # welcome once per session and user, without holding the script thread
+    if st.session_state.get("welcomed") != username:
+        st.toast(f"Welcome {name}")
+        st.session_state["welcomed"] = username
+
+    @st.cache_resource
+    def get_sales_data():
+        # built once per process; pandas frame + cube, or DuckDB over Parquet with SALES_BACKEND=duckdb
+        with span("load"):
+            return load_sales("data clean complete2.xlsx")
+
+    @st.cache_data(ttl=600, show_spinner=False)
+    def refresh_sales_data(_sales_data):
+        # new files in increments/ are appended at most every 10 minutes
+        with span("load.refresh"):
+            return _sales_data.refresh()
+
+    sales_data = get_sales_data()
+    if refresh_sales_data(sales_data) is None:
+        # the workbook itself was edited, rebuild everything
+        get_sales_data.clear()
+        refresh_sales_data.clear()
+        sales_data = get_sales_data()
 
     #style CSS
-    with open('style.css') as f:
-        st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
+    @st.cache_resource
+    def get_css():
+        with open('style.css') as f:
+            return f.read()
+
+    st.markdown(f'<style>{get_css()}</style>', unsafe_allow_html=True)
 
     #JSON
-    with open('gov.geojson', 'r', encoding='utf-8') as j:
-        geojson_data = json.load(j)
-
-    for feature in geojson_data['features']:
-        # Convert 'name' property to uppercase
-        if 'name' in feature['properties']:
-            if isinstance(feature['properties']['name'], str):
-                feature['properties']['name'] = feature['properties']['name'].upper()
-        
-        # Convert 'name:fr' property to uppercase
-        if 'name:fr' in feature['properties']:
-            if isinstance(feature['properties']['name:fr'], str):
-                feature['properties']['name:fr'] = feature['properties']['name:fr'].upper()
-
-    # Save modified GeoJSON file
-    with open('gov_modified.geojson', 'w', encoding='utf-8') as j:
-        json.dump(geojson_data, j)
+    @st.cache_resource
+    def get_geojson():
+        # upper-cased names and simplified polygons, prepared once per process
+        return prepare_geojson('gov.geojson')
+
+    geojson_data = get_geojson()
+
+    def plot(container, fig, stage, **kwargs):
+        # st.plotly_chart serializes the figure, timed as its own stage
+        with span(f"render.{stage}"):
+            container.plotly_chart(fig, **kwargs)
 
     # ---- SIDEBAR ----
     authenticator.logout("Logout", "sidebar")
@@ -104,28 +102,53 @@ if authentication_status:
 
     company = st.sidebar.multiselect(
         "Select the Company:",
-        options=df["Company Name"].unique(),
-        default=df["Company Name"].unique()
+        options=sales_data.options("Company Name"),
+        default=sales_data.options("Company Name")
     )
 
     year = st.sidebar.multiselect(
         "Select the year:",
-        options=df["Year"].unique(),
-        default=df["Year"].unique()
+        options=sales_data.options("Year"),
+        default=sales_data.options("Year")
     )
 
     activity = st.sidebar.multiselect(
         "Select the activity:",
-        options=df["Company Activity"].unique(),
-        default=df["Company Activity"].unique()
+        options=sales_data.options("Company Activity"),
+        default=sales_data.options("Company Activity")
     )
 
-    df_selection = df.query("`Company Name` == @company and `Year` == @year and `Company Activity` == @activity ")
+    # filter spec for the views, same rows as
+    # df.query("`Company Name` == @company and `Year` == @year and `Company Activity` == @activity ")
+    # within the invoice dates, both days included
+    selection = {"Company Name": company, "Year": year, "Company Activity": activity}
+
+    date_bounds = sales_data.date_bounds()
+    # no slider without dates, nor for a single day (st.slider needs min < max)
+    if date_bounds is not None and date_bounds[0] < date_bounds[1]:
+        first_day, last_day = date_bounds
+        selection["Invoice Date"] = st.sidebar.slider(
+            "Select the invoice dates:",
+            min_value=first_day,
+            max_value=last_day,
+            value=(first_day, last_day),
+            format="DD/MM/YYYY"
+        )
 
 
     # ---- MAINPAGE ----
-    EY = Image.open('assets/EY_logo.png')
-    companyX = Image.open('assets/companyXwhite.png')
+    @st.cache_resource
+    def get_logo(path, width):
+        # opened and downscaled once per process (EY_logo.png is 4741x4985),
+        # kept at twice the display width for high-density screens
+        from PIL import Image
+
+        image = Image.open(path)
+        image.thumbnail((2 * width, 2 * width * image.height // image.width + 1))
+        return image
+
+    EY = get_logo('assets/EY_logo.png', 100)
+    companyX = get_logo('assets/companyXwhite.png', 200)
 
     left_column, middle_column, right_column = st.columns(3)
     with left_column:
@@ -145,420 +168,78 @@ if authentication_status:
     # st.markdown("""---""")
     st.markdown("##")
 
-    # different pages/tabs
-    tab1, tab2, tab3 = st.tabs(["Overall Sales", "Local Sales", "Export Sales"])
-
-    # TOP KPI's
-    total_sales = int(df_selection["Net Sales"].sum())
-    # total_quantity_sold = round(df_selection["Quantity"].sum())
-    clients_nb = df_selection["Invoice Code"].nunique()
-    average_sale_by_transaction = round(df_selection["Net Sales"].mean(), 2)
-
-
-    # SALES BY COMPANY [BAR CHART]
-    sales_by_company = (
-        #df_selection.groupby(by=["Company Name"]).sum()[["Net Sales"]].sort_values(by="Net Sales")
-        df_selection.groupby(by=["Company Name"]).agg({"Net Sales": "sum"}).sort_values(by="Net Sales")
-        #df_selection.groupby(by=["Company Name"]).agg({"Net Sales": lambda x: np.sum(x, dtype=object)}).sort_values(by="Net Sales")
-
-    )
-    fig_company_sales = px.bar(
-        sales_by_company,
-        x="Net Sales",
-        y=sales_by_company.index,
-        orientation="h",
-        title="<b>Sales by Company</b>",
-        color_discrete_sequence=["#0083B8"] * len(sales_by_company),
-        template="plotly_white",
-        labels={"Company Name": "Company", "Net Sales": "Sales"}
-
-    )
-
-    fig_company_sales.update_layout(
-        xaxis_title="Total sales", 
-        yaxis_title="Company",
-        plot_bgcolor="rgba(0,0,0,0)",
-        xaxis=(dict(showgrid=False))
-    )
-
-
-    # SALES BY YEAR [BAR CHART]
-    #sales_by_year = df_selection.groupby(by=["Year"]).sum()[["Net Sales"]]
-    sales_by_year = df_selection.groupby(by=["Year"]).agg({"Net Sales": "sum"})
-
-    fig_yearly_sales = px.bar(
-        sales_by_year,
-        x=sales_by_year.index,
-        y="Net Sales",
-        title="<b>Sales by year</b>",
-        color_discrete_sequence=["#0083B8"] * len(sales_by_year),
-        template="plotly_white",
-        labels={"Year": "Year", "Net Sales": "Sales"}
-
-    )
-    fig_yearly_sales.update_layout(
-        xaxis_title="Year", 
-        yaxis_title="Total sales",
-        xaxis=dict(tickmode="linear"),
-        plot_bgcolor="rgba(0,0,0,0)",
-        yaxis=(dict(showgrid=False)),
-    )
-
-    # SALES PER PRODUCT LINE[BAR CHART]
-    #sales_per_product_line = df_selection.groupby(by=["Product Line"]).sum()[["Net Sales"]]
-    sales_per_product_line = df_selection.groupby(by=["Product Line"]).agg({"Net Sales": "sum"})
-
-    top_5 = sales_per_product_line.sort_values("Net Sales", ascending=False).iloc[:5]
-    others = sales_per_product_line.loc[~sales_per_product_line.index.isin(top_5.index)]
-    other_sum = others["Net Sales"].sum()
-    threshold = other_sum * 0.1
-
-    top_5_names = top_5.index.tolist()
-    top_5_names.append("Other")
-
-    top_5_values = top_5["Net Sales"].tolist()
-    if other_sum > threshold:
-        top_5_values.append(other_sum)
-    else:
-        top_5_names.pop()
-
-    fig_sales_per_product_line = px.bar(
-        sales_per_product_line,
-        x= top_5_names,
-        y= top_5_values,
-        title="<b>Sales per product line</b>",
-        color_discrete_sequence=["#0083B8"] * len(sales_per_product_line),
-        template="plotly_white",
-        labels={"Product Line": "Product line", "Net Sales": "Sales"},
-    )
-
-    fig_sales_per_product_line.update_layout(
-        xaxis_title="Product line",
-        yaxis_title="Sales",
-        xaxis=dict(tickmode="linear"),
-        plot_bgcolor="rgba(0,0,0,0)",
-        yaxis=(dict(showgrid=False)),
-    )
-
-    fig_sales_per_product_line.update_traces(
-        hovertemplate="<br>".join([
-            "Product Line: %{x}",
-            "Sales: %{y}"
-        ])
-    )
-
-    # SALES PER MARKET TYPE[PIE CHART]
-    fig_sales_per_market = px.pie(
-        df_selection, 
-        values= "Net Sales",
-        names= "Market",
-        title="<b>Sales per market type</b>",
-        color_discrete_sequence=["#0083B8","#A5D7E8"],
-        template="plotly_white",
-        labels={"Market": "Market", "Net Sales": "Sales"}
-
-    )
-
-    #SALES PER CITY [MAP]
-    city_coordinates = {
-        'TUNIS': {'lat': 36.8065, 'lon': 10.1815},
-        'SFAX': {'lat': 34.7406, 'lon': 10.7604},
-        'SOUSSE': {'lat': 35.8288, 'lon': 10.6405},
-        'ARIANA': {'lat': 36.8625, 'lon': 10.1944},
-        'BEN AROUS': {'lat': 36.7531, 'lon': 10.2137},
-        'BIZERTE': {'lat': 37.2628, 'lon': 9.8739},
-        'BEJA': {'lat': 36.725, 'lon': 9.1814},
-        'GABES': {'lat': 33.8825, 'lon': 10.1167},
-        'GAFSA': {'lat': 34.425, 'lon': 8.7842},
-        'JENDOUBA': {'lat': 36.5019, 'lon': 8.7761},
-        'KAIROUAN': {'lat': 35.6786, 'lon': 10.0944},
-        'KASSERINE': {'lat': 35.1683, 'lon': 8.8308},
-        'KEBILI': {'lat': 33.7022, 'lon': 8.9691},
-        'KEF': {'lat': 36.1829, 'lon': 8.7142},
-        'MAHDIA': {'lat': 35.5014, 'lon': 11.0623},
-        'MANOUBA': {'lat': 36.8089, 'lon': 10.0992},
-        'Manouba': {'lat': 36.8089, 'lon': 10.0992},
-        'MEDNINE': {'lat': 33.3542, 'lon': 10.4978},
-        'MONASTIR': {'lat': 35.7878, 'lon': 10.8272},
-        'NABEUL': {'lat': 36.4602, 'lon': 10.7345},
-        'SIDI BOUZID': {'lat': 35.0317, 'lon': 9.4916},
-        'SILIANA': {'lat': 36.0833, 'lon': 9.375},
-        'TATAOUINE': {'lat': 32.9397, 'lon': 10.4511},
-        'TOZEUR': {'lat': 33.9209, 'lon': 8.1339},
-        'ZAGHOUAN': {'lat': 36.4012, 'lon': 10.1424}
-    }
-
-    df_local_init = df_selection[df_selection["Market"] == "Local"]
-
-
-    # Add latitude and longitude columns based on the city names
-    df_local_init['lat'] = df_local_init['Governorate'].apply(lambda x: city_coordinates[x]['lat'])
-    df_local_init['lon'] = df_local_init['Governorate'].apply(lambda x: city_coordinates[x]['lon'])
-
-    fig_sales_per_city = px.choropleth_mapbox(
-        df_local_init,
-        geojson=geojson_data,
-        locations="Governorate",
-        color="Net Sales",
-        # featureidkey='properties.name:fr',
-        hover_name='Governorate',
-        mapbox_style="carto-positron",
-        zoom=5.5,
-        center={"lat": 35.8, "lon": 10.2},
-        opacity=0.8,
-        labels={"Net Sales": "Sales"}
-    )
-    fig_bubble = px.scatter_mapbox(
-        df_local_init,
-        lat="lat",
-        lon="lon",
-        color="Net Sales",
-        size=df_local_init["Net Sales"],
-        size_max=50,
-        zoom=5.5,
-        center={"lat": 35.8, "lon": 10.2},
-        opacity=0.8,
-        color_continuous_scale="Blues",
-        hover_data={"Net Sales": True, "lat": False, "lon": False},
-        labels={"Net Sales": "Sales"}
-    )
-
-    # Add the bubble map as a new trace on top of the choropleth map
-    fig_sales_per_city.add_trace(fig_bubble.data[0])
-
-    fig_sales_per_city.update_layout(
-        title="<b>Sales per Tunisian City</b>",
-        margin={"r":0,"t":0,"l":0,"b":0},
-        coloraxis_showscale=False
-    )
-
-    #LOCAL SALES PER MONTH AND YEAR [BARCHART]
-
-    # Convert Invoice Date column to datetime and extract month-year as a new column
-    df_local_init["month-year"] = pd.to_datetime(df_local_init["Invoice Date"], format="%d/%m/%Y").dt.strftime("%B %Y")
-    
-    # original
-    df_local = df_local_init.groupby("month-year").agg({"Net Sales": "sum"}).reset_index()
-    
-    #git
-    #df_local = df_local_init.groupby("month-year").agg(numeric_only=True, Net_Sales=("Net Sales", "sum")).reset_index()
-
-
-    # Create a list of all the month-year values in chronological order
-    month_year_list = sorted(df_local["month-year"], key=lambda x: pd.to_datetime(x, format="%B %Y"))
-    df_local_sorted = df_local.sort_values("month-year", key=lambda x: x.map({month_year_list[i]: i for i in range(len(month_year_list))}))
-
-
-    # Create the bar chart using Plotly Express
-    fig_local_sales = px.line(
-        df_local_sorted,
-        x="month-year",
-        y="Net Sales",
-        color_discrete_sequence=["#0083B8"] * len(df_local),
-        template="plotly_white",
-        category_orders={"month-year": month_year_list},
-        labels={"month-year": "Date", "Net Sales": "Sales"}
-    )
-
-
-    fig_local_sales.update_layout(
-        title="<b>Local Sales per Month and Year</b>",
-        width=1200
-    )
-
-    # LOCAL SALES BY COMPANY [BAR CHART]
-    local_sales_by_company = (
-        #df_local_init.groupby(by=["Company Name"]).sum()[["Net Sales"]].sort_values(by="Net Sales")
-        df_local_init.groupby(by=["Company Name"]).agg({"Net Sales": "sum"}).sort_values(by="Net Sales")
-    )
-    fig_local_company_sales = px.bar(
-        local_sales_by_company,
-        x="Net Sales",
-        y=local_sales_by_company.index,
-        orientation="h",
-        title="<b>Local Sales by Company</b>",
-        color_discrete_sequence=["#0083B8"] * len(sales_by_company),
-        template="plotly_white",
-        labels={"Company Name": "Company", "Net Sales": "Sales"}
-
-    )
-
-    fig_local_company_sales.update_layout(
-        xaxis_title="Total sales", 
-        yaxis_title="Company",
-        plot_bgcolor="rgba(0,0,0,0)",
-        xaxis=(dict(showgrid=False))
-    )
-
-    #LOCAL SALES PER GAMME [PIE CHART]
-    #local_sales_per_gamme = df_local_init.groupby(by=["Product Line"]).sum()[["Net Sales"]]
-    local_sales_per_gamme = df_local_init.groupby(by=["Product Line"]).agg({"Net Sales": "sum"})
-    
-    top_5 = local_sales_per_gamme.sort_values("Net Sales", ascending=False).iloc[:5]
-    others = local_sales_per_gamme.loc[~local_sales_per_gamme.index.isin(top_5.index)]
-    other_sum = others["Net Sales"].sum()
-    threshold = other_sum * 0.1
-
-    top_5_names = top_5.index.tolist()
-    top_5_names.append("Other")
-
-    top_5_values = top_5["Net Sales"].tolist()
-    if other_sum > threshold:
-        top_5_values.append(other_sum)
-    else:
-        top_5_names.pop()
-
-
-    fig_local_sales_per_gamme = px.pie(
-        df_local_init, 
-        values= top_5_values,
-        names= top_5_names,
-        title="<b>Local Sales per product line</b>",
-        color_discrete_sequence = ["#084594", "#2171b5", "#4292c6", "#6baed6", "#9ecae1", "#c6dbef"],
-        template="plotly_white",
-        labels={"Product Line": "Product line", "Net Sales": "Sales"},
-    )
-
-    #EXPORT SALES PER MONTH AND YEAR [BARCHART]
-
-    df_export_init = df_selection[df_selection["Market"] == "Export"]
-
-    # Convert Invoice Date column to datetime and extract month-year as a new column
-    df_export_init["month-year"] = pd.to_datetime(df_export_init["Invoice Date"], format="%d/%m/%Y").dt.strftime("%B %Y")
-
-    # original
-    df_export = df_export_init.groupby("month-year").agg({"Net Sales": "sum"}).reset_index()
-   
-    
-    #git
-    #df_export = df_export_init.groupby("month-year").agg(numeric_only=True, Net_Sales=("Net Sales", "sum")).reset_index()
-
-    # Create a list of all the month-year values in chronological order
-    month_year_list = sorted(df_export["month-year"], key=lambda x: pd.to_datetime(x, format="%B %Y"))
-    df_export_sorted = df_export.sort_values("month-year", key=lambda x: x.map({month_year_list[i]: i for i in range(len(month_year_list))}))
-
-
-    # Create the bar chart using Plotly Express
-    fig_export_sales = px.line(
-        df_export_sorted,
-        x="month-year",
-        y="Net Sales",
-        color_discrete_sequence=["#0083B8"] * len(df_export),
-        template="plotly_white",
-        category_orders={"month-year": month_year_list},
-        labels={"month-year": "Date", "Net Sales": "Sales"}
-    )
-
-    fig_export_sales.update_layout(
-        title="<b>Export Sales per Month and Year</b>",
-        width=1200
-    )
-
-    # EXPORT SALES BY COMPANY [BAR CHART]
-    export_sales_by_company = (
-        #df_export_init.groupby(by=["Company Name"]).sum()[["Net Sales"]].sort_values(by="Net Sales")
-        df_export_init.groupby(by=["Company Name"]).agg({"Net Sales": "sum"}).sort_values(by="Net Sales")
-
-    )
-
-    fig_export_company_sales = px.pie(
-        export_sales_by_company,
-        values= "Net Sales",
-        names= export_sales_by_company.index,
-        title="<b>Export Sales by company</b>",
-        color_discrete_sequence = ["#084594", "#2171b5", "#4292c6", "#6baed6", "#9ecae1", "#c6dbef"],
-        template="plotly_white"
-    )
-
-
-    # EXPORT SALES BY ACTIVITY [BAR CHART]
-    export_sales_by_activity = (
-        #df_export_init.groupby(by=["Company Activity"]).sum()[["Net Sales"]].sort_values(by="Net Sales")
-        df_export_init.groupby(by=["Company Activity"]).agg({"Net Sales": "sum"}).sort_values(by="Net Sales")
-    )
-    
-    fig_export_company_sales_activity = px.bar(
-        export_sales_by_activity,
-        x=export_sales_by_activity.index,
-        y="Net Sales",
-        title="<b>Export Sales by activity</b>",
-        color_discrete_sequence=["#0083B8"] * len(export_sales_by_activity),
-        template="plotly_white",
-        labels={"Company Activity": "Company activity", "Net Sales": "Sales"}
-
-    )
-
-    fig_export_company_sales_activity.update_layout(
-        xaxis_title="Activity", 
-        yaxis_title="Total sales",
-        plot_bgcolor="rgba(0,0,0,0)",
-        xaxis=dict(tickmode="linear"),
-        yaxis=(dict(showgrid=False))
-    )
-
-    fig_export_company_sales_activity.update_xaxes(categoryorder="total descending")
-
-    #EXPORT SALES PER GAMME [PIE CHART]
-    #export_sales_per_gamme = df_export_init.groupby(by=["Product Line"]).sum()[["Net Sales"]]
-    export_sales_per_gamme = df_export_init.groupby(by=["Product Line"]).agg({"Net Sales": "sum"})
-    
-
-    top_5 = export_sales_per_gamme.sort_values("Net Sales", ascending=False).iloc[:5]
-    others = export_sales_per_gamme.loc[~export_sales_per_gamme.index.isin(top_5.index)]
-    other_sum = others["Net Sales"].sum()
-    threshold = other_sum * 0.1
-
-    top_5_names = top_5.index.tolist()
-    top_5_names.append("Other")
-
-    top_5_values = top_5["Net Sales"].tolist()
-    if other_sum > threshold:
-        top_5_values.append(other_sum)
-    else:
-        top_5_names.pop()
-
-
-    fig_export_sales_per_gamme = px.pie(
-        df_export_init, 
-        values= top_5_values,
-        names= top_5_names,
-        title="<b>Export Sales per product line</b>",
-        color_discrete_sequence = ["#084594", "#2171b5", "#4292c6", "#6baed6", "#9ecae1", "#c6dbef"],
-        template="plotly_white",
-        labels={"Product Line": "Product line", "Net Sales": "Sales"}
-
-    )
-
-    #EXPORT SALES PER PRODUCT RANGE [PIE CHART]
-    #export_sales_per_range = df_export_init.groupby(by=["Product Range"]).sum()[["Net Sales"]]
-    export_sales_per_range = df_export_init.groupby(by=["Product Range"]).agg({"Net Sales": "sum"})
-    
-
-    top_5 = export_sales_per_range.sort_values("Net Sales", ascending=False).iloc[:5]
-    others = export_sales_per_range.loc[~export_sales_per_range.index.isin(top_5.index)]
-    other_sum = others["Net Sales"].sum()
-    threshold = other_sum * 0.1
-
-    top_5_names = top_5.index.tolist()
-    top_5_names.append("Other")
-
-    top_5_values = top_5["Net Sales"].tolist()
-    if other_sum > threshold:
-        top_5_values.append(other_sum)
-    else:
-        top_5_names.pop()
-
-
-    fig_export_sales_per_range= px.pie(
-        df_export_init, 
-        values= top_5_values,
-        names= top_5_names,
-        title="<b>Export Sales per product range</b>",
-        color_discrete_sequence = ["#084594", "#2171b5", "#4292c6", "#6baed6", "#9ecae1", "#c6dbef"],
-        template="plotly_white",
-        labels={"Product Range": "Product range", "Net Sales": "Sales"}
-
-    )
+    # ---- TABS ----
+    # fragments: switching tabs reruns only sales_tabs, a widget inside a tab only
+    # that tab's fragment; the header, assets and sidebar are not run again.
+    # Changing a sidebar filter still reruns the page, every tab depends on it.
+    # A fragment running alone is timed as its own "rerun.fragment" (TIMINGS.rerun).
+
+    @st.fragment
+    def overall_tab(selection):
+        with TIMINGS.rerun("rerun.fragment"), span("fragment.overall"):
+            # memoized per normalized selection, shared across sessions
+            overall, overall_figs = cached_view(sales_data, "overall", selection, overall_figures)
+
+            left_column, middle_column, right_column = st.columns(3)
+            with left_column:
+                st.subheader(":bar_chart: Total Sales")
+                st.subheader(f"{overall['total_sales']:,} TND")
+            with middle_column:
+                st.subheader(":bar_chart: Total number of clients")
+                # "~" when counted from sketches (APPROXIMATE_CLIENTS=1)
+                approx = "~" if sales_data.approximate_clients else ""
+                st.subheader(f"{approx}{overall['clients_nb']} client")
+            with right_column:
+                st.subheader(":bar_chart: Average Sales Transaction")
+                st.subheader(f"{overall['average_sale_by_transaction']} TND")
+            st.markdown("""---""")
+
+            left_column, right_column = st.columns(2)
+            plot(left_column, overall_figs["yearly_sales"], "overall.yearly_sales", use_container_width=True)
+            plot(right_column, overall_figs["company_sales"], "overall.company_sales", use_container_width=True)
+
+            left_column, right_column = st.columns(2)
+            plot(left_column, overall_figs["sales_per_product_line"], "overall.sales_per_product_line", use_container_width=True)
+            plot(right_column, overall_figs["sales_per_market"], "overall.sales_per_market", use_container_width=True)
+
+    @st.fragment
+    def local_tab(selection):
+        with TIMINGS.rerun("rerun.fragment"), span("fragment.local"):
+            _, local_figs = cached_view(sales_data, "local", selection, local_figures, geojson_data)
+
+            plot(st, local_figs["monthly_sales"], "local.monthly_sales")
+            left_column, middle_column, right_column = st.columns(3)
+            plot(left_column, local_figs["company_sales"], "local.company_sales", use_container_width=True)
+            plot(middle_column, local_figs["sales_per_product_line"], "local.sales_per_product_line", use_container_width=True)
+            plot(right_column, local_figs["sales_per_city"], "local.sales_per_city", use_container_width=True)
+
+    @st.fragment
+    def export_tab(selection):
+        with TIMINGS.rerun("rerun.fragment"), span("fragment.export"):
+            _, export_figs = cached_view(sales_data, "export", selection, export_figures)
+
+            plot(st, export_figs["monthly_sales"], "export.monthly_sales")
+            left_column, middle_column, right_column = st.columns(3)
+            plot(left_column, export_figs["sales_per_product_range"], "export.sales_per_product_range", use_container_width=True)
+            plot(middle_column, export_figs["sales_by_activity"], "export.sales_by_activity", use_container_width=True)
+            plot(right_column, export_figs["sales_per_product_line"], "export.sales_per_product_line", use_container_width=True)
+
+    @st.fragment
+    def sales_tabs(selection):
+        with TIMINGS.rerun("rerun.fragment"), span("fragment.tabs"):
+            # only the open tab computes its view and figures
+            tab1, tab2, tab3 = st.tabs(["Overall Sales", "Local Sales", "Export Sales"], key="tab", on_change="rerun")
+            with tab1:
+                if tab1.open:
+                    overall_tab(selection)
+            with tab2:
+                if tab2.open:
+                    local_tab(selection)
+            with tab3:
+                if tab3.open:
+                    export_tab(selection)
+
+    sales_tabs(selection)
 
     # ---- HIDE STREAMLIT STYLE ----
     hide_st_style = """
@@ -589,38 +270,13 @@ if authentication_status:
     # st.subheader(html.unescape(f"{icon} Total Sales"))
 
 
-    with tab1:
-        left_column, middle_column, right_column = st.columns(3)
-        with left_column:
-            st.subheader(":bar_chart: Total Sales")
-            st.subheader(f"{total_sales:,} TND")
-        with middle_column:
-            st.subheader(":bar_chart: Total number of clients")
-            st.subheader(f"{clients_nb} client")
-        with right_column:
-            st.subheader(":bar_chart: Average Sales Transaction")
-            st.subheader(f"{average_sale_by_transaction} TND")
-        st.markdown("""---""")
-
-        left_column, right_column = st.columns(2)
-        left_column.plotly_chart(fig_yearly_sales, use_container_width=True)
-        right_column.plotly_chart(fig_company_sales, use_container_width=True)
-
-        left_column, right_column = st.columns(2)
-        left_column.plotly_chart(fig_sales_per_product_line, use_container_width=True)
-        right_column.plotly_chart(fig_sales_per_market, use_container_width=True)
-
-
-    with tab2:
-        st.plotly_chart(fig_local_sales)
-        left_column, middle_column, right_column = st.columns(3)
-        left_column.plotly_chart(fig_local_company_sales, use_container_width=True)
-        middle_column.plotly_chart(fig_local_sales_per_gamme, use_container_width=True)
-        right_column.plotly_chart(fig_sales_per_city, use_container_width=True)
-
-    with tab3:
-        st.plotly_chart(fig_export_sales)
-        left_column, middle_column, right_column = st.columns(3)
-        left_column.plotly_chart(fig_export_sales_per_range, use_container_width=True)
-        middle_column.plotly_chart(fig_export_company_sales_activity, use_container_width=True)
-        right_column.plotly_chart(fig_export_sales_per_gamme, use_container_width=True)
+    # ---- PERFORMANCE ----
+    TIMINGS.end_rerun()
+    if username in ADMIN_USERS:
+        with st.sidebar.expander("Performance"):
+            # p50/p95 per stage over the last spans of this process
+            st.dataframe(TIMINGS.summary().round(1))
+            # memoized views and figures, shared by every session of the process
+            st.caption("View cache")
+            st.json(sales_data.view_cache.stats())
+            st.download_button("Export timings (JSON lines)", TIMINGS.to_json_lines(), file_name="timings.jsonl")
@@ -0,0 +1,91 @@
+"""Import times of what appfinal.py loads, as JSON lines like benchmarks.run.
+
+    python -m benchmarks.importtime --output bench_results.jsonl
+
+Each stage imports a group of modules in a fresh ``python -X importtime``
+interpreter and records the cumulative time of those imports, plus the
+packages that took longest themselves, so a startup regression shows up
+next to the pipeline timings.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.run import git_commit
+
+# stage -> modules imported together, in appfinal.py's order
+STAGES = {
+    # before login: all the page needs to show the form
+    "login_page": ["streamlit", "streamlit_authenticator", "users"],
+    # after login: the data and figure modules, and what they bring in
+    "dashboard_page": ["dashboard", "figures", "geo", "timings"],
+    "pandas": ["pandas"],
+    "pyarrow": ["pyarrow"],
+    "plotly.express": ["plotly.express"],
+    "openpyxl": ["openpyxl"],
+    "PIL.Image": ["PIL.Image"],
+}
+
+
+def parse_importtime(stderr):
+    """``(package, depth, self seconds, cumulative seconds)`` per ``-X importtime`` line."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        head, cumulative_us, name = line.split("|")
+        self_us = head.removeprefix("import time:")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), depth, int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return entries
+
+
+def import_time(modules, top=5):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        capture_output=True, text=True, check=True,
+    )
+    entries = parse_importtime(result.stderr)
+    total = sum(cumulative for name, depth, _, cumulative in entries if depth == 0 and name in modules)
+    slowest = sorted(entries, key=lambda entry: entry[2], reverse=True)[:top]
+    return total, [{"package": name, "self_seconds": seconds} for name, _, seconds, _ in slowest]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="append JSON lines here instead of stdout")
+    args = parser.parse_args(argv)
+
+    common = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+    }
+    out = open(args.output, "a") if args.output else sys.stdout
+    try:
+        for stage, modules in STAGES.items():
+            runs = [import_time(modules) for _ in range(args.repeat)]
+            times = [total for total, _ in runs]
+            record = {
+                "stage": f"import.{stage}",
+                "modules": modules,
+                "seconds": min(times),
+                "median_seconds": statistics.median(times),
+                "runs": len(times),
+                "slowest": runs[times.index(min(times))][1],
+                **common,
+            }
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+"""Time the dashboard pipeline on synthetic data and append JSON lines results.
+
+    python -m benchmarks.run --rows 100000 1000000 --output bench_results.jsonl
+
+Each line is one stage at one scale: ``{"stage", "rows", "seconds", "runs",
+"commit", "timestamp", ...}``. Stages follow appfinal.py: load, schema,
+filter, cube, one per chart aggregation and one per figure build/serialize.
+``filter_date_*`` and ``view.*.quarter`` stages time a one-quarter
+invoice-date range, compared over the full column and through the sorted
+``DateIndex``. ``memory.*`` stages add the peak bytes allocated by one call,
+for the market views against the slice-and-assign frames appfinal.py used
+to build. With duckdb installed, ``duckdb.*`` stages time the same views on
+the DuckDB backend next to their pandas ``view.*`` counterparts.
+
+``excel_read*`` stages read a workbook of the first ``EXCEL_ROWS`` rows.
+
+The run also asserts that the parallel Excel reader gives the
+``pd.read_excel`` frame, that the bitmap index selects the ``df.query`` rows
+and that every cube roll-up equals the raw-row groupby it replaced, and exits
+with an error when a serialized figure is over ``figures.FIGURE_BUDGET_BYTES``
+(``over_budget`` on its ``serialize.*`` line). The city map is built with
+the prepared ``--geojson`` boundaries, as in the app.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_sales_frame
+from geo import CITY_COORDINATES, GEOJSON_PATH, prepare_geojson
+from ingestion import read_excel, read_excel_parallel
+from cube import DETAIL_DIMENSIONS, SalesCubes, average_sales, rollup, total_sales
+from date_index import DateIndex
+from filter_index import FILTER_COLUMNS, FilterIndex
+from schema import apply_schema
+from sketches import DistinctSketches
+from time_buckets import MONTH_COLUMN, add_month_key
+import dashboard
+import figures
+
+# rows of the synthetic workbook, openpyxl writes and reads a few thousand per second
+EXCEL_ROWS = 5_000
+# more than one even on a single core, so the row ranges are always exercised
+EXCEL_WORKERS = 3
+
+
+def timed(fn, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, times
+
+
+def peak_allocated(fn):
+    # numpy and pandas buffers are reported to tracemalloc too
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def default_selection(df):
+    # what most users keep: everything but one year, to exercise the index
+    years = sorted(df["Year"].unique())
+    return {
+        "Company Name": list(df["Company Name"].cat.categories),
+        "Year": years[1:],
+        "Company Activity": list(df["Company Activity"].cat.categories),
+    }
+
+
+def narrow_selection(df):
+    # two companies, one year and one activity, to exercise the bitmap ORs and ANDs
+    return {
+        "Company Name": list(df["Company Name"].cat.categories[:2]),
+        "Year": sorted(df["Year"].unique())[-1:],
+        "Company Activity": list(df["Company Activity"].cat.categories[:1]),
+    }
+
+
+def query_rows(df, selection):
+    # the df.query call appfinal.py filtered with before the bitmap index
+    company, year, activity = (selection[col] for col in FILTER_COLUMNS)
+    return df.query(
+        "`Company Name` == @company and `Year` == @year and `Company Activity` == @activity ",
+        local_dict={"company": company, "year": year, "activity": activity},
+    )
+
+
+def quarter_selection(df, selection):
+    # the selection narrowed to the last full quarter of the dates, for the date-range stages
+    last = df["Invoice Date"].max()
+    end = last.to_period("Q").start_time - pd.Timedelta(days=1)
+    start = end.to_period("Q").start_time
+    return {**selection, "Invoice Date": (start.date(), end.date())}
+
+
+def check_rollups(data, df, selection):
+    """Assert every cube roll-up equals the raw-row groupby of the selected rows.
+
+    Up to float summation order; covers the three markets and every column a
+    chart groups on, plus the KPI totals.
+    """
+    rows = query_rows(df, selection)
+    for market in (None, "Local", "Export"):
+        market_rows = rows if market is None else rows[rows["Market"] == market]
+        cells = data.select_cells(selection, market)
+        assert np.isclose(total_sales(cells), market_rows["Net Sales"].sum()), market
+        assert np.isclose(average_sales(cells), market_rows["Net Sales"].mean()), market
+        for by in ["Company Name", "Year", "Company Activity", "Market", MONTH_COLUMN, *DETAIL_DIMENSIONS]:
+            cube_by = by if by in DETAIL_DIMENSIONS else None
+            pd.testing.assert_frame_equal(
+                rollup(data.select_cells(selection, market, cube_by), by),
+                market_rows.groupby(by=[by], observed=True).agg({"Net Sales": "sum"}),
+                check_exact=False,
+                obj=f"{by} roll-up ({market or 'all markets'})",
+            )
+
+
+def chart_aggregations(data, selection):
+    def cells(market=None, by=None):
+        return data.select_cells(selection, market, by)
+
+    overall, local, export = cells(), cells("Local"), cells("Export")
+    lines, local_lines, export_lines = cells(by="Product Line"), cells("Local", "Product Line"), cells("Export", "Product Line")
+    cities, export_ranges = cells("Local", "Governorate"), cells("Export", "Product Range")
+    return {
+        "sales_by_company": lambda: dashboard.sales_by_company(overall),
+        "sales_by_year": lambda: dashboard.sales_by_year(overall),
+        "sales_per_product_line": lambda: dashboard.sales_per_product_line(lines),
+        "sales_per_market": lambda: dashboard.sales_per_market(overall),
+        "sales_per_city": lambda: dashboard.sales_per_city(cities),
+        "local_monthly": lambda: dashboard.monthly_sales(local),
+        "local_sales_by_company": lambda: dashboard.sales_by_company(local),
+        "local_sales_per_gamme": lambda: dashboard.sales_per_product_line(local_lines),
+        "export_monthly": lambda: dashboard.monthly_sales(export),
+        "export_sales_by_activity": lambda: dashboard.sales_by_activity(export),
+        "export_sales_per_gamme": lambda: dashboard.sales_per_product_line(export_lines),
+        "export_sales_per_range": lambda: dashboard.sales_per_product_range(export_ranges),
+    }
+
+
+def figure_builders(results, geojson=None):
+    # without boundaries the map stages measure the trace payload only
+    geojson = geojson or {"type": "FeatureCollection", "features": []}
+    return {
+        "sales_by_company": lambda: figures.company_bar(results["sales_by_company"], "<b>Sales by Company</b>"),
+        "sales_by_year": lambda: figures.yearly_bar(results["sales_by_year"]),
+        "sales_per_product_line": lambda: figures.product_line_bar(*results["sales_per_product_line"]),
+        "sales_per_market": lambda: figures.market_pie(results["sales_per_market"]),
+        "sales_per_city": lambda: figures.city_map(results["sales_per_city"], geojson),
+        "local_monthly": lambda: figures.monthly_line(results["local_monthly"], "<b>Local Sales per Month and Year</b>"),
+        "local_sales_by_company": lambda: figures.company_bar(results["local_sales_by_company"], "<b>Local Sales by Company</b>"),
+        "local_sales_per_gamme": lambda: figures.top_n_pie(*results["local_sales_per_gamme"], "<b>Local Sales per product line</b>"),
+        "export_monthly": lambda: figures.monthly_line(results["export_monthly"], "<b>Export Sales per Month and Year</b>"),
+        "export_sales_by_activity": lambda: figures.activity_bar(results["export_sales_by_activity"], "<b>Export Sales by activity</b>"),
+        "export_sales_per_gamme": lambda: figures.top_n_pie(*results["export_sales_per_gamme"], "<b>Export Sales per product line</b>"),
+        "export_sales_per_range": lambda: figures.top_n_pie(*results["export_sales_per_range"], "<b>Export Sales per product range</b>"),
+    }
+
+
+def legacy_market_frame(df_selection, market):
+    # what appfinal.py did per rerun: slice the market, then add columns to the slice
+    frame = df_selection[df_selection["Market"] == market].copy()
+    if market == "Local":
+        frame["lat"] = frame["Governorate"].map(lambda x: CITY_COORDINATES[x]["lat"])
+        frame["lon"] = frame["Governorate"].map(lambda x: CITY_COORDINATES[x]["lon"])
+    frame["month-year"] = frame["Invoice Date"].dt.strftime("%B %Y")
+    return frame
+
+
+def memory_stages(data, df_selection, selection, repeat):
+    stages = {
+        "legacy_local": lambda: legacy_market_frame(df_selection, "Local"),
+        "legacy_export": lambda: legacy_market_frame(df_selection, "Export"),
+        "market_mask": lambda: data.chunks[0].cubes[None].index.mask({**selection, "Market": ["Local"]}),
+        "view.local": lambda: dashboard.local_view(data, selection),
+        "view.export": lambda: dashboard.export_view(data, selection),
+    }
+    for name, fn in stages.items():
+        peak = peak_allocated(fn)
+        _, times = timed(fn, repeat)
+        yield f"memory.{name}", times, {"peak_bytes": peak}
+
+
+def run_duckdb(raw, selection, repeat):
+    """The views again on ``DuckDBSalesData`` over a Parquet copy of ``raw``."""
+    try:
+        from duckdb_backend import DuckDBSalesData
+    except ImportError:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        parquet_path = Path(tmp) / "sales.parquet"
+        raw.to_parquet(parquet_path, index=False)
+        data, times = timed(lambda: DuckDBSalesData([parquet_path]), repeat)
+        yield "duckdb.build", times, {}
+        cells, times = timed(lambda: data.select_cells(selection), repeat)
+        yield "duckdb.cube_select", times, {"selected_cells": len(cells)}
+        _, times = timed(lambda: data.distinct_clients(selection), repeat)
+        yield "duckdb.kpi_clients", times, {}
+        for name, view in dashboard.VIEWS.items():
+            _, times = timed(lambda: view(data, selection), repeat)
+            yield f"duckdb.view.{name}", times, {}
+
+
+def run_excel(raw, repeat):
+    """Cold reads of a workbook of ``raw``'s first rows, openpyxl alone and in parallel.
+
+    ``read_excel_parallel`` feeds openpyxl slices of the sheet through its
+    internals, so its frame is asserted equal to ``read_excel``'s, for the
+    whole sheet, the default ``nrows`` and a prefix ending inside a range.
+    """
+    sample = raw.head(EXCEL_ROWS)
+    positions = np.arange(len(sample))
+    # the workbook's last columns (usecols="A:N"), not in the synthetic frame
+    sample = sample.assign(**{
+        "Customer": [f"C{i % 97:03d}" for i in positions],
+        "Product Code": positions % 1_000,
+        "Unit Price": sample["Net Sales"] / sample["Quantity"].clip(lower=1),
+    })
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "sales.xlsx"
+        sample.to_excel(path, sheet_name="data", index=False)
+        expected, times = timed(lambda: read_excel(path, nrows=None), repeat)
+        yield "excel_read", times, {"sheet_rows": len(expected)}
+        parallel, times = timed(lambda: read_excel_parallel(path, nrows=None, workers=EXCEL_WORKERS), repeat)
+        yield "excel_read_parallel", times, {"sheet_rows": len(parallel), "workers": EXCEL_WORKERS}
+        assert parallel.equals(expected)
+        assert read_excel_parallel(path, workers=EXCEL_WORKERS).equals(read_excel(path))
+        nrows = len(sample) // 2 + 1
+        assert read_excel_parallel(path, nrows=nrows, workers=EXCEL_WORKERS).equals(read_excel(path, nrows=nrows))
+
+
+def run(n_rows, repeat, seed=0, geojson=None):
+    """Benchmark one scale, yielding ``(stage, times, extra)`` tuples.
+
+    ``geojson`` is the prepared boundaries the city map is built with.
+    """
+    raw = make_sales_frame(n_rows, seed=seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        parquet_path = Path(tmp) / "sales.parquet"
+        raw.to_parquet(parquet_path, index=False)
+        raw, times = timed(lambda: pd.read_parquet(parquet_path), repeat)
+        yield "load", times, {"bytes": parquet_path.stat().st_size}
+
+    yield from run_excel(raw, repeat)
+
+    df, times = timed(lambda: add_month_key(apply_schema(raw)), repeat)
+    yield "schema", times, {"memory_mb": df.attrs["memory_mb"]}
+
+    index, times = timed(lambda: FilterIndex(df), repeat)
+    yield "filter_index_build", times, {}
+
+    selection = default_selection(df)
+    _, times = timed(lambda: query_rows(df, selection), repeat)
+    yield "filter_query", times, {}
+    df_selection, times = timed(lambda: index.select(df, selection), repeat)
+    yield "filter_index", times, {"selected_rows": len(df_selection)}
+    # exactly the rows the query gave, in the same order
+    for checked in (selection, narrow_selection(df)):
+        assert index.select(df, checked).equals(query_rows(df, checked)), checked
+
+    date_index, times = timed(lambda: DateIndex(df["Invoice Date"]), repeat)
+    yield "date_index_build", times, {"sorted": date_index.order is None}
+    start, end = quarter_selection(df, selection)["Invoice Date"]
+    dates = df["Invoice Date"]
+    in_range, times = timed(
+        lambda: df[(dates >= pd.Timestamp(start)) & (dates < pd.Timestamp(end) + pd.Timedelta(days=1))], repeat
+    )
+    yield "filter_date_compare", times, {"selected_rows": len(in_range)}
+    _, times = timed(lambda: df.iloc[date_index.rows(start, end)], repeat)
+    yield "filter_date_index", times, {"selected_rows": len(in_range)}
+
+    cubes, times = timed(lambda: SalesCubes(df), repeat)
+    yield "cube_build", times, {"cells": cubes.cell_counts()}
+    for by, cube in cubes.cubes.items():
+        cells, times = timed(lambda: cube.select(selection), repeat)
+        yield f"cube_select.{by or 'base'}", times, {"selected_cells": len(cells)}
+
+    exact, times = timed(lambda: df_selection["Invoice Code"].nunique(), repeat)
+    yield "kpi_clients", times, {}
+
+    data = dashboard.SalesData(df)
+    _, times = timed(lambda: data.distinct_clients(selection), repeat)
+    yield "kpi_clients.codes", times, {}
+    sketches, times = timed(lambda: DistinctSketches(df), repeat)
+    yield "kpi_clients.sketch_build", times, {"partitions": len(sketches.partitions)}
+    estimate, times = timed(lambda: sketches.estimate(selection), repeat)
+    yield "kpi_clients.sketch", times, {"relative_error": (estimate - exact) / exact if exact else 0.0}
+
+    for checked in (selection, narrow_selection(df)):
+        check_rollups(data, df, checked)
+
+    for name, view in dashboard.VIEWS.items():
+        _, times = timed(lambda: view(data, selection), repeat)
+        yield f"view.{name}", times, {}
+    quarter = quarter_selection(df, selection)
+    for name, view in dashboard.VIEWS.items():
+        _, times = timed(lambda: view(data, quarter), repeat)
+        yield f"view.{name}.quarter", times, {}
+
+    yield from memory_stages(data, df_selection, selection, repeat)
+    yield from run_duckdb(raw, selection, repeat)
+
+    results = {}
+    for name, aggregate in chart_aggregations(data, selection).items():
+        results[name], times = timed(aggregate, repeat)
+        yield f"aggregate.{name}", times, {}
+
+    for name, build in figure_builders(results, geojson).items():
+        fig, times = timed(build, repeat)
+        yield f"figure.{name}", times, {}
+        payload, times = timed(fig.to_json, repeat)
+        try:
+            figures.check_figure_size(fig)
+            over_budget = False
+        except figures.FigureTooLarge as exc:
+            print(f"over budget: {exc}", file=sys.stderr)
+            over_budget = True
+        yield f"serialize.{name}", times, {
+            "bytes": len(payload), "budget_bytes": figures.FIGURE_BUDGET_BYTES, "over_budget": over_budget,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="append JSON lines here instead of stdout")
+    parser.add_argument("--geojson", default=GEOJSON_PATH, help="governorate boundaries for the city map")
+    args = parser.parse_args(argv)
+
+    geojson = None
+    if Path(args.geojson).exists():
+        geojson = prepare_geojson(args.geojson)
+    else:
+        print(f"{args.geojson} not found, the city map is measured without boundaries", file=sys.stderr)
+
+    common = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+    }
+    over_budget = []
+    out = open(args.output, "a") if args.output else sys.stdout
+    try:
+        for n_rows in args.rows:
+            for stage, times, extra in run(n_rows, args.repeat, args.seed, geojson):
+                if extra.get("over_budget"):
+                    over_budget.append(f"{stage} at {n_rows:,} rows")
+                record = {
+                    "stage": stage,
+                    "rows": n_rows,
+                    "seconds": min(times),
+                    "median_seconds": statistics.median(times),
+                    "runs": len(times),
+                    **extra,
+                    **common,
+                }
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if over_budget:
+        # after every line is written, so the sizes are on record
+        raise SystemExit(f"figures over {figures.FIGURE_BUDGET_BYTES:,} bytes: {', '.join(over_budget)}")
+
+
+if __name__ == "__main__":
+    main()
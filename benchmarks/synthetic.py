@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from geo import CITY_COORDINATES
+
+COMPANIES = ["GPA", "CMS", "CAP", "ACS"]
+ACTIVITIES = ["Paint", "Chemicals", "Adhesives", "Construction"]
+MARKETS = ["Local", "Export"]
+YEARS = [2019, 2020, 2021, 2022, 2023]
+
+
+def make_sales_frame(n_rows, seed=0, n_product_lines=40, n_product_ranges=2_000, rows_per_invoice=4, raw=True):
+    """Synthetic sales rows with the columns appfinal.py reads from the workbook.
+
+    With ``raw=True`` the frame looks like ``pd.read_excel`` output (object
+    strings, original company codes, "%d/%m/%Y" date strings) so it can go
+    through ``apply_schema``; otherwise it is already typed.
+    """
+    rng = np.random.default_rng(seed)
+    governorates = list(CITY_COORDINATES)
+
+    def categorical(values, weights=None):
+        codes = rng.choice(len(values), n_rows, p=weights)
+        return pd.Categorical.from_codes(codes, categories=values)
+
+    years = rng.choice(YEARS, n_rows)
+    day_of_year = rng.integers(0, 365, n_rows)
+    invoice_date = pd.to_datetime(years.astype(str), format="%Y") + pd.to_timedelta(day_of_year, unit="D")
+
+    # a few skewed product lines, a long tail of product ranges
+    line_weights = 1 / np.arange(1, n_product_lines + 1)
+    range_weights = 1 / np.arange(1, n_product_ranges + 1) ** 0.8
+
+    df = pd.DataFrame({
+        "Company Name": categorical(COMPANIES),
+        "Year": years.astype("int64"),
+        "Company Activity": categorical(ACTIVITIES),
+        "Market": categorical(MARKETS, [0.7, 0.3]),
+        "Governorate": categorical(governorates),
+        "Invoice Date": invoice_date,
+        "Invoice Code": pd.Categorical.from_codes(
+            np.arange(n_rows) // rows_per_invoice,
+            categories=[f"F{i:08d}" for i in range((n_rows - 1) // rows_per_invoice + 1)],
+        ),
+        "Product Line": categorical([f"Line {i}" for i in range(n_product_lines)], line_weights / line_weights.sum()),
+        "Product Range": categorical([f"Range {i}" for i in range(n_product_ranges)], range_weights / range_weights.sum()),
+        "Quantity": rng.integers(1, 50, n_rows),
+        "Net Sales": rng.gamma(2.0, 500.0, n_rows).round(3),
+    })
+
+    if raw:
+        for col in df.columns[df.dtypes == "category"]:
+            df[col] = df[col].astype(object)
+        df["Invoice Date"] = df["Invoice Date"].dt.strftime("%d/%m/%Y").astype(object)
+    return df
@@ -0,0 +1,87 @@
+from filter_index import FILTER_COLUMNS, FilterIndex
+from time_buckets import MONTH_COLUMN, month_key
+
+# sidebar filters plus the Local/Export split of the market tabs
+CELL_INDEX_COLUMNS = FILTER_COLUMNS + ["Market"]
+
+# grain of the base cube: the KPIs, the company/year/activity bars, the
+# market pie and the monthly series all roll up from it
+BASE_DIMENSIONS = CELL_INDEX_COLUMNS + [MONTH_COLUMN]
+
+# one small cube each, for the charts grouping on them; no month, so a
+# product range or governorate is not multiplied by every month it sold in
+DETAIL_DIMENSIONS = ["Product Line", "Product Range", "Governorate"]
+
+
+def cube_dimensions(by=None):
+    """Grain of the cube for ``by``: the base grain, or the filters and market plus ``by``."""
+    if by is None:
+        return BASE_DIMENSIONS
+    if by not in DETAIL_DIMENSIONS:
+        raise ValueError(f"no cube by {by!r}, expected None or one of {DETAIL_DIMENSIONS}")
+    return CELL_INDEX_COLUMNS + [by]
+
+
+def aggregate_cells(df, dimensions=BASE_DIMENSIONS):
+    """Sum and count of "Net Sales" per combination of ``dimensions`` in the raw rows."""
+    if MONTH_COLUMN in dimensions and MONTH_COLUMN not in df.columns:
+        df = df.assign(**{MONTH_COLUMN: month_key(df["Invoice Date"])})
+    return (
+        df.groupby(dimensions, observed=True, dropna=False)["Net Sales"]
+        .agg(["sum", "count"])
+        .rename(columns={"sum": "Net Sales", "count": "Count"})
+        .reset_index()
+    )
+
+
+class SalesCube:
+    """Sum and count of "Net Sales" pre-aggregated over ``dimensions``.
+
+    Built once at load time. The sidebar filters are applied to the cube cells
+    through their own ``FilterIndex`` and the charts roll up from the
+    selected cells, so a rerun only touches the cells instead of the raw rows.
+    Roll-ups equal the raw-row groupbys up to float summation order. Never
+    updated: rows added later get cubes of their own (``dashboard.SalesChunk``)
+    and the roll-ups sum the cells the two have in common.
+    """
+
+    def __init__(self, df, dimensions=BASE_DIMENSIONS):
+        self.dimensions = list(dimensions)
+        self.cells = aggregate_cells(df, self.dimensions)
+        self.index = FilterIndex(self.cells, CELL_INDEX_COLUMNS)
+
+    def select(self, selection, market=None):
+        # the market is one more bitmap in the same mask, the cells are copied once
+        if market is not None:
+            selection = {**selection, "Market": [market]}
+        return self.index.select(self.cells, selection)
+
+
+class SalesCubes:
+    """The base cube and one cube per ``DETAIL_DIMENSIONS``, looked up by ``by``."""
+
+    def __init__(self, df):
+        self.cubes = {by: SalesCube(df, cube_dimensions(by)) for by in [None, *DETAIL_DIMENSIONS]}
+
+    def __getitem__(self, by):
+        return self.cubes[by]
+
+    def cell_counts(self):
+        return {by or "base": len(cube.cells) for by, cube in self.cubes.items()}
+
+    def select(self, selection, market=None, by=None):
+        return self.cubes[by].select(selection, market=market)
+
+
+def rollup(cells, by):
+    """Same frame as ``df.groupby(by=[by]).agg({"Net Sales": "sum"})`` on the raw rows."""
+    return cells.groupby(by=[by], observed=True).agg({"Net Sales": "sum"})
+
+
+def total_sales(cells):
+    return cells["Net Sales"].sum()
+
+
+def average_sales(cells):
+    # mean of the raw rows: NaN sales are neither summed nor counted
+    return cells["Net Sales"].sum() / cells["Count"].sum()
@@ -0,0 +1,418 @@
+"""Headless computations behind appfinal.py.
+
+Everything here is plain pandas: load the sales data once with
+``SalesData.load``, then call ``overall_view``, ``local_view`` or
+``export_view`` with a filter spec (column -> selected values, and
+"Invoice Date" -> (first day, last day); the same dict the sidebar builds)
+to get the aggregated frames each tab plots. Nothing imports streamlit, so
+the views can be cached, benchmarked or run in worker processes on their
+own.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from aggregations import top_n_with_other
+from cube import SalesCubes, aggregate_cells, average_sales, cube_dimensions, rollup, total_sales
+from date_index import DATE_COLUMN, DateIndex
+from filter_index import FilterIndex
+from geo import attach_coordinates
+from ingestion import EXCEL_PATH, ingest_increments, read_parts, store_parts
+from memo import LRUCache, filter_key
+from schema import apply_schema, concat_categorical, extend_categories
+from sketches import DistinctSketches, hll_estimate
+from shared_frame import map_shared_frame, shared_frame_path, write_shared_frame
+from time_buckets import add_month_key, month_labels
+from timings import span, timed
+
+# distinct filter selections kept per process, views and their figures together
+VIEW_CACHE_SIZE = 256
+# chunks a SalesData holds before its appended chunks are merged into one
+MAX_CHUNKS = 8
+
+
+def typed_sales_frame(df):
+    # categorical/int16/datetime64 dtypes, companies renamed on the categories
+    df = apply_schema(df)
+    # integer month key, the monthly series group and sort on it
+    return add_month_key(df)
+
+
+def load_sales_frame(path=EXCEL_PATH, parts=None):
+    """The typed frame, memory-mapped from .cache/ and shared by every process on the host.
+
+    Built from the Parquet cache only when the workbook or its increments
+    changed. ``parts`` (from ``ingestion.store_parts``) fixes which parts it
+    holds, by default the current ones.
+    """
+    if parts is None:
+        _, parts = store_parts(path)
+    arrow_path = shared_frame_path(path, parts=parts)
+    if not arrow_path.exists():
+        write_shared_frame(typed_sales_frame(read_parts(parts)), arrow_path)
+    return map_shared_frame(arrow_path)
+
+
+class SalesChunk:
+    """Rows loaded together, with their own filter bitmaps, date index, cubes and sketches.
+
+    Never modified once built. The mapped frame is one chunk and each refresh
+    adds one for its new rows, so appending costs time in the new rows only;
+    selections run on every chunk and their results are concatenated.
+    """
+
+    def __init__(self, df, approximate_clients=False):
+        self.df = df
+        # bitmaps for the sidebar filters
+        self.filter_index = FilterIndex(df)
+        # rows in invoice-date order for the date-range slider
+        self.date_index = DateIndex(df[DATE_COLUMN])
+        # Net Sales sums/counts per (company, year, activity, market) and month,
+        # product line, product range or governorate
+        self.cubes = SalesCubes(df)
+        # HyperLogLog per company x year x activity, merged per selection (~0.8% standard error)
+        self.client_sketches = DistinctSketches(df) if approximate_clients else None
+
+    def date_rows(self, date_range):
+        # None when the range keeps every row of the chunk, and the cubes can answer
+        if date_range is None:
+            return None
+        start, end = date_range
+        index = self.date_index
+        if index.n_dated == len(index) and index.covers(start, end):
+            return None
+        return index.rows(start, end)
+
+    def row_positions(self, filters, date_range=None, market=None):
+        """Positions of the rows under ``filters``, ``date_range`` and ``market``.
+
+        In date order within a range, which the date index gives in
+        O(log n + k); only the k in-range rows are masked.
+        """
+        rows = self.date_rows(date_range)
+        if rows is None:
+            positions = np.flatnonzero(self.filter_index.mask(filters))
+        else:
+            if isinstance(rows, slice):
+                rows = np.arange(rows.start, rows.stop)
+            positions = rows[self.filter_index.mask(filters, rows)]
+        if market is not None:
+            markets = self.df["Market"]
+            if market not in markets.cat.categories:
+                return positions[:0]
+            codes = markets.cat.codes.to_numpy()
+            positions = positions[codes[positions] == markets.cat.categories.get_loc(market)]
+        return positions
+
+    def select_rows(self, filters, date_range=None):
+        return self.df.iloc[self.row_positions(filters, date_range)]
+
+    def client_codes(self, filters, date_range=None):
+        # dictionary codes of "Invoice Code" under the row mask, the rows are never materialized
+        codes = self.df["Invoice Code"].cat.codes.to_numpy()
+        rows = self.date_rows(date_range)
+        if rows is None:
+            return codes[self.filter_index.mask(filters)]
+        return codes[rows][self.filter_index.mask(filters, rows)]
+
+    def select_cells(self, filters, date_range=None, market=None, by=None):
+        if self.date_rows(date_range) is None:
+            return self.cubes.select(filters, market=market, by=by)
+        # the cubes are by month at best, a date range is aggregated from its own rows,
+        # copied once and only the columns of the cells
+        dimensions = cube_dimensions(by)
+        positions = self.row_positions(filters, date_range, market)
+        columns = self.df.columns.get_indexer(dimensions + ["Net Sales"])
+        return aggregate_cells(self.df.iloc[positions, columns], dimensions)
+
+
+class SalesData:
+    """The typed sales frame as chunks with their filter indexes and cubes.
+
+    ``chunks`` is a tuple replaced as a whole, never modified, so a reader
+    holding it sees one consistent version while ``append`` builds the next.
+    """
+
+    def __init__(self, df, path=None, approximate_clients=False, version=None):
+        self.path = path
+        self.approximate_clients = approximate_clients
+        # workbook sha256 and number of Parquet parts in the rows, see ingestion.store_parts
+        self.version = version
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.chunks = (SalesChunk(df, approximate_clients),)
+        # shared by every session using this data, dropped with it
+        self.view_cache = LRUCache(VIEW_CACHE_SIZE)
+
+    @classmethod
+    def load(cls, path=EXCEL_PATH, approximate_clients=False):
+        version, parts = store_parts(path)
+        return cls(load_sales_frame(path, parts), path=path, approximate_clients=approximate_clients, version=version)
+
+    def __len__(self):
+        return sum(len(chunk.df) for chunk in self.chunks)
+
+    def append(self, rows):
+        """Add typed rows (see ``typed_sales_frame``) as a new chunk; existing rows are not touched.
+
+        The rows are private to this process; the next ``load`` maps the
+        shared version that includes them. Past ``MAX_CHUNKS`` the appended
+        chunks are merged into one, the mapped frame is never rebuilt.
+        """
+        with self._lock:
+            chunks = self.chunks
+            # the last chunk has every category seen so far
+            rows = extend_categories(chunks[-1].df, rows)
+            start = len(self)
+            rows.index = pd.RangeIndex(start, start + len(rows))
+            chunks = chunks + (SalesChunk(rows, self.approximate_clients),)
+            if len(chunks) > MAX_CHUNKS:
+                merged = concat_categorical([chunk.df for chunk in chunks[1:]])
+                chunks = (chunks[0], SalesChunk(merged, self.approximate_clients))
+            self.chunks = chunks
+            self.view_cache.clear()
+
+    def refresh(self):
+        """Pick up new daily exports; returns the number of rows added.
+
+        Reads every Parquet part past the ones loaded, also those another
+        process ingested first. Returns ``None`` when the workbook itself
+        changed, in which case the data has to be loaded again with ``SalesData.load``.
+        """
+        # one refresh at a time, two sessions must not append the same parts
+        with self._refresh_lock:
+            rows, version = ingest_increments(self.version, self.path)
+            if rows is None:
+                return None
+            if len(rows):
+                self.append(typed_sales_frame(rows))
+            self.version = version
+            return len(rows)
+
+    def snapshot(self):
+        """The current chunks as one version; every query on it sees the same rows."""
+        return SalesSnapshot(self.chunks, self.approximate_clients)
+
+    def options(self, column):
+        return self.snapshot().options(column)
+
+    def date_bounds(self):
+        return self.snapshot().date_bounds()
+
+    def select_rows(self, filters):
+        return self.snapshot().select_rows(filters)
+
+    def distinct_clients(self, filters):
+        return self.snapshot().distinct_clients(filters)
+
+    def select_cells(self, filters, market=None, by=None):
+        return self.snapshot().select_cells(filters, market=market, by=by)
+
+
+class SalesSnapshot:
+    """Queries over one version of ``SalesData.chunks``.
+
+    The views run on a snapshot, so a refresh publishing new chunks in the
+    middle of a view cannot mix rows from before and after it.
+    """
+
+    def __init__(self, chunks, approximate_clients=False):
+        self.chunks = chunks
+        self.approximate_clients = approximate_clients
+
+    def options(self, column):
+        # sidebar choices, in order of first appearance
+        chunks = self.chunks
+        if len(chunks) == 1:
+            return chunks[0].df[column].unique()
+        values = concat_categorical([pd.DataFrame({column: chunk.df[column].unique()}) for chunk in chunks])
+        return values[column].unique()
+
+    def date_bounds(self):
+        # first and last invoice day, the ends of the date slider
+        bounds = [b for b in (chunk.date_index.bounds() for chunk in self.chunks) if b is not None]
+        if not bounds:
+            return None
+        return min(first for first, _ in bounds), max(last for _, last in bounds)
+
+    def date_range(self, filters):
+        """``(first day, last day)`` selected in ``filters``.
+
+        None without a date filter or when the range covers every date.
+        """
+        if DATE_COLUMN not in filters:
+            return None
+        start, end = filters[DATE_COLUMN]
+        bounds = self.date_bounds()
+        if bounds is None:
+            return None
+        first, last = bounds
+        if pd.Timestamp(start) <= pd.Timestamp(first) and pd.Timestamp(end) >= pd.Timestamp(last):
+            return None
+        return start, end
+
+    def select_rows(self, filters):
+        date_range = self.date_range(filters)
+        return concat_categorical([chunk.select_rows(filters, date_range) for chunk in self.chunks])
+
+    def distinct_clients(self, filters):
+        with span("filter.clients"):
+            chunks = self.chunks
+            date_range = self.date_range(filters)
+            if self.approximate_clients and date_range is None:
+                # the sketches have no dates, a date range is counted exactly below
+                registers = [chunk.client_sketches.merged_registers(filters) for chunk in chunks]
+                registers = [r for r in registers if r is not None]
+                if not registers:
+                    return 0
+                return int(round(hll_estimate(np.maximum.reduce(registers))))
+            # exact: distinct codes; the chunks share one set of codes (see ``append``)
+            selected = np.concatenate([chunk.client_codes(filters, date_range) for chunk in chunks])
+            return int(np.count_nonzero(np.bincount(selected[selected >= 0])))
+
+    def select_cells(self, filters, market=None, by=None):
+        """Cells of the cube for ``by`` (see ``cube.cube_dimensions``) under ``filters``.
+
+        With several chunks a combination can have one cell per chunk; the
+        roll-ups sum them.
+        """
+        with span("filter.cells") as info:
+            date_range = self.date_range(filters)
+            cells = concat_categorical(
+                [chunk.select_cells(filters, date_range, market, by) for chunk in self.chunks],
+                ignore_index=True,
+            )
+            info["rows"] = len(cells)
+        return cells
+
+
+def load_sales(path=EXCEL_PATH, backend=None, approximate_clients=None):
+    """``SalesData`` or ``duckdb_backend.DuckDBSalesData``, by name or ``$SALES_BACKEND``.
+
+    Both answer ``select_cells``/``distinct_clients``/``options``/``date_bounds``
+    and ``snapshot``, which is all the views below and appfinal.py use. ``approximate_clients``
+    (default ``$APPROXIMATE_CLIENTS=1``) counts clients with HyperLogLog
+    sketches instead of exactly.
+    """
+    backend = backend or os.environ.get("SALES_BACKEND", "pandas")
+    if approximate_clients is None:
+        approximate_clients = os.environ.get("APPROXIMATE_CLIENTS") == "1"
+    if backend == "duckdb":
+        from duckdb_backend import DuckDBSalesData
+        return DuckDBSalesData.load(path, approximate_clients=approximate_clients)
+    if backend != "pandas":
+        raise ValueError(f"unknown sales backend {backend!r}, expected 'pandas' or 'duckdb'")
+    return SalesData.load(path, approximate_clients=approximate_clients)
+
+
+# ---- PER-CHART AGGREGATIONS ----
+# each takes cube cells and returns what the matching figures.py builder plots
+
+@timed("aggregate")
+def sales_by_company(cells):
+    return rollup(cells, "Company Name").sort_values(by="Net Sales")
+
+
+@timed("aggregate")
+def sales_by_year(cells):
+    return rollup(cells, "Year")
+
+
+@timed("aggregate")
+def sales_by_activity(cells):
+    return rollup(cells, "Company Activity").sort_values(by="Net Sales")
+
+
+@timed("aggregate")
+def sales_per_market(cells):
+    return rollup(cells, "Market").reset_index()
+
+
+@timed("aggregate")
+def sales_per_product_line(cells):
+    return top_n_with_other(rollup(cells, "Product Line"))
+
+
+@timed("aggregate")
+def sales_per_product_range(cells):
+    return top_n_with_other(rollup(cells, "Product Range"))
+
+
+@timed("aggregate")
+def sales_per_city(cells):
+    # one row per governorate, coordinates joined from CITY_COORDINATES
+    return attach_coordinates(rollup(cells, "Governorate")).reset_index()
+
+
+@timed("aggregate")
+def monthly_sales(cells):
+    # month keys sort chronologically, only the output rows get a "%B %Y" label
+    monthly = rollup(cells, "Month")
+    monthly["month-year"] = month_labels(monthly.index)
+    return monthly.reset_index(drop=True)
+
+
+# ---- VIEWS ----
+
+@timed("view")
+def overall_view(data, filters):
+    cells = data.select_cells(filters)
+    return {
+        "total_sales": int(total_sales(cells)),
+        "clients_nb": data.distinct_clients(filters),
+        "average_sale_by_transaction": round(average_sales(cells), 2),
+        "sales_by_company": sales_by_company(cells),
+        "sales_by_year": sales_by_year(cells),
+        "sales_per_product_line": sales_per_product_line(data.select_cells(filters, by="Product Line")),
+        "sales_per_market": sales_per_market(cells),
+    }
+
+
+@timed("view")
+def local_view(data, filters):
+    cells = data.select_cells(filters, market="Local")
+    return {
+        "monthly_sales": monthly_sales(cells),
+        "sales_by_company": sales_by_company(cells),
+        "sales_per_product_line": sales_per_product_line(data.select_cells(filters, "Local", "Product Line")),
+        "sales_per_city": sales_per_city(data.select_cells(filters, "Local", "Governorate")),
+    }
+
+
+@timed("view")
+def export_view(data, filters):
+    cells = data.select_cells(filters, market="Export")
+    return {
+        "monthly_sales": monthly_sales(cells),
+        "sales_by_company": sales_by_company(cells),
+        "sales_by_activity": sales_by_activity(cells),
+        "sales_per_product_line": sales_per_product_line(data.select_cells(filters, "Export", "Product Line")),
+        "sales_per_product_range": sales_per_product_range(data.select_cells(filters, "Export", "Product Range")),
+    }
+
+
+VIEWS = {
+    "overall": overall_view,
+    "local": local_view,
+    "export": export_view,
+}
+
+
+def cached_view(data, name, filters, build=None, *build_args):
+    """``VIEWS[name](data, filters)``, memoized on the normalized filter spec.
+
+    With ``build`` the cached value is ``(view, build(view, *build_args))``,
+    typically the figures.py builder for that view, so identical selections
+    from any session skip both the aggregation and the figure construction.
+    """
+    def compute():
+        # one version of the data for the whole view, see SalesSnapshot
+        view = VIEWS[name](data.snapshot(), filters)
+        if build is None:
+            return view
+        return view, build(view, *build_args)
+
+    key = (name, build.__name__ if build else None, filter_key(filters))
+    return data.view_cache.get_or_compute(key, compute)
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+# sidebar date-range slider
+DATE_COLUMN = "Invoice Date"
+
+
+def _day(value):
+    # date, datetime, Timestamp or datetime64 -> datetime64[ns] at midnight
+    return pd.Timestamp(value).normalize().to_datetime64().astype("datetime64[ns]")
+
+
+class DateIndex:
+    """Row positions in invoice-date order, for date ranges resolved by binary search.
+
+    Built once at load: the sorted dates plus a stable argsort of the rows, or
+    no permutation at all when the frame is already in date order. A range is
+    two ``searchsorted`` calls on the sorted dates and gives a contiguous run
+    of positions, so selecting k rows costs O(log n + k) instead of comparing
+    the full column. Missing dates sort last and fall in no range.
+    """
+
+    def __init__(self, dates):
+        dates = np.asarray(dates, dtype="datetime64[ns]")
+        # rows with a date, they come first in date order
+        self.n_dated = len(dates) - np.count_nonzero(np.isnat(dates))
+        # NaT compares false, a missing date also takes the argsort below
+        if np.all(dates[1:] >= dates[:-1]):
+            # None: row i is the i-th date, ranges are plain slices of the frame
+            self.order = None
+            self.sorted_dates = dates
+        else:
+            self.order = np.argsort(dates, kind="stable")
+            self.sorted_dates = dates[self.order]
+
+    def __len__(self):
+        return len(self.sorted_dates)
+
+    def bounds(self):
+        """First and last invoice day as ``datetime.date``, None when no row has a date."""
+        if not self.n_dated:
+            return None
+        return pd.Timestamp(self.sorted_dates[0]).date(), pd.Timestamp(self.sorted_dates[self.n_dated - 1]).date()
+
+    def covers(self, start, end):
+        # the whole range of dates selected, the filter does not restrict anything
+        bounds = self.bounds()
+        return bounds is None or (_day(start) <= _day(bounds[0]) and _day(end) >= _day(bounds[1]))
+
+    def rows(self, start, end):
+        """Rows dated ``start`` to ``end`` (whole days, both included).
+
+        A slice of the frame when it is in date order, otherwise their
+        positions in date order.
+        """
+        lo = np.searchsorted(self.sorted_dates, _day(start), side="left")
+        hi = np.searchsorted(self.sorted_dates, _day(end) + np.timedelta64(1, "D"), side="left")
+        if self.order is None:
+            return slice(int(lo), int(hi))
+        return self.order[lo:hi]
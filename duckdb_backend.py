@@ -0,0 +1,190 @@
+"""DuckDB backend for the dashboard views.
+
+Same interface as ``dashboard.SalesData`` (``select_cells``,
+``distinct_clients``, ``options``, ``refresh`` and ``view_cache``), but no
+sales rows are kept in pandas: every call is a query over the Parquet store
+written by ingestion.py. The sidebar filters go into the WHERE clause on the
+stored columns, so DuckDB pushes them down into the Parquet scan, and the
+group-by to the cube grain runs on all cores. Only the selected cells come
+back as a frame, typed like ``SalesCube.cells``.
+
+Chosen with ``SALES_BACKEND=duckdb`` (see ``dashboard.load_sales``).
+"""
+import datetime
+import threading
+
+import duckdb
+
+from cube import cube_dimensions
+from dashboard import VIEW_CACHE_SIZE
+from date_index import DATE_COLUMN
+from filter_index import FILTER_COLUMNS
+from ingestion import EXCEL_PATH, store_parts
+from memo import LRUCache
+from schema import COMPANY_MAPPING, INVOICE_DATE_FORMAT, apply_schema
+from time_buckets import MONTH_COLUMN
+from timings import span
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _literal(text):
+    return "'" + text.replace("'", "''") + "'"
+
+
+def _plain(value):
+    # numpy scalars from the multiselect options -> python, duckdb binds those
+    return value.item() if hasattr(value, "item") else value
+
+
+class DuckDBSalesData:
+    """The sales store queried in place with DuckDB."""
+
+    def __init__(self, files, path=None, company_mapping=COMPANY_MAPPING, approximate_clients=False, version=None):
+        self.path = path
+        # workbook sha256 and number of Parquet parts attached, see ingestion.store_parts
+        self.version = version
+        # DuckDB's own HyperLogLog instead of an exact count(DISTINCT)
+        self.approximate_clients = approximate_clients
+        self.company_mapping = company_mapping
+        # filters arrive with the display names, the files hold the original codes
+        self._stored_company = {v: k for k, v in company_mapping.items()}
+        self._con = duckdb.connect()
+        self._lock = threading.Lock()
+        self.view_cache = LRUCache(VIEW_CACHE_SIZE)
+        self._attach(files)
+
+    @classmethod
+    def load(cls, path=EXCEL_PATH, approximate_clients=False):
+        version, parts = store_parts(path)
+        return cls(parts, path=path, approximate_clients=approximate_clients, version=version)
+
+    def _attach(self, files):
+        sources = ", ".join(_literal(str(f)) for f in files)
+        self._con.execute(
+            f"CREATE OR REPLACE VIEW sales AS SELECT * FROM read_parquet([{sources}], union_by_name = true)"
+        )
+        types = dict(self._con.execute(
+            "SELECT column_name, column_type FROM (DESCRIBE sales)"
+        ).fetchall())
+        date = _quote(DATE_COLUMN)
+        if types[DATE_COLUMN] == "VARCHAR":
+            date = f"strptime({date}, {_literal(INVOICE_DATE_FORMAT)})"
+        self._date = date
+        # same keys as time_buckets.month_key
+        self._month = f"CAST(year({date}) * 12 + month({date}) - 1 AS INTEGER)"
+        first, last = self._query(f"SELECT CAST(min({date}) AS DATE), CAST(max({date}) AS DATE) FROM sales").fetchone()
+        self._date_bounds = None if first is None else (first, last)
+        # sidebar choices, asked for on every rerun
+        self._options = {col: self._distinct(col) for col in FILTER_COLUMNS}
+        self._values = {col: set(values) for col, values in self._options.items()}
+
+    def _query(self, sql, params=()):
+        # one cursor per call, Streamlit runs every session in its own thread
+        return self._con.cursor().execute(sql, list(params))
+
+    def _where(self, filters, market=None):
+        clauses, params = [], []
+        for col in FILTER_COLUMNS:
+            if col not in filters:
+                continue
+            values = {_plain(v) for v in filters[col]}
+            if values >= self._values[col]:
+                # every value selected, the column does not restrict anything
+                continue
+            if col == "Company Name":
+                values = {self._stored_company.get(v, v) for v in values}
+            if not values:
+                clauses.append("false")
+                continue
+            clauses.append(f"{_quote(col)} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+        if DATE_COLUMN in filters and self._date_bounds is not None:
+            start, end = filters[DATE_COLUMN]
+            first, last = self._date_bounds
+            if start > first or end < last:
+                # whole days, the end included; pushed down like the other filters
+                clauses.append(f"{self._date} >= ? AND {self._date} < ?")
+                params.extend([start, end + datetime.timedelta(days=1)])
+        if market is not None:
+            clauses.append('"Market" = ?')
+            params.append(market)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return where, params
+
+    def _distinct(self, column):
+        values = [
+            row[0] for row in self._query(
+                f"SELECT DISTINCT {_quote(column)} FROM sales WHERE {_quote(column)} IS NOT NULL"
+            ).fetchall()
+        ]
+        if column == "Company Name":
+            values = [self.company_mapping.get(v, v) for v in values]
+        return sorted(values)
+
+    def options(self, column):
+        """Distinct values of a column, sorted, with the display company names."""
+        if column in self._options:
+            return self._options[column]
+        return self._distinct(column)
+
+    def date_bounds(self):
+        # first and last invoice day, the ends of the date slider
+        return self._date_bounds
+
+    def snapshot(self):
+        # each query reads the view as it is when it starts; views computed
+        # across a refresh are not cached, see LRUCache.clear
+        return self
+
+    def refresh(self):
+        """Pick up new daily exports; returns the number of rows added.
+
+        Attaches every Parquet part past the ones attached, also those
+        another process ingested first. Returns ``None`` when the workbook
+        itself changed, in which case the data has to be loaded again with
+        ``DuckDBSalesData.load``.
+        """
+        with self._lock:
+            version, parts = store_parts(self.path)
+            if version[0] != self.version[0]:
+                return None
+            new_parts = parts[self.version[1]:]
+            if not new_parts:
+                return 0
+            sources = ", ".join(_literal(str(f)) for f in new_parts)
+            rows = self._query(f"SELECT count(*) FROM read_parquet([{sources}])").fetchone()[0]
+            self._attach(parts)
+            self.version = version
+            self.view_cache.clear()
+        return rows
+
+    def select_cells(self, filters, market=None, by=None):
+        where, params = self._where(filters, market)
+        dims = ", ".join(
+            f"{self._month} AS {_quote(col)}" if col == MONTH_COLUMN else _quote(col)
+            for col in cube_dimensions(by)
+        )
+        with span("filter.cells") as info:
+            cells = self._query(
+                f"SELECT {dims},"
+                ' coalesce(sum("Net Sales"), 0) AS "Net Sales", count("Net Sales") AS "Count"'
+                f" FROM sales{where} GROUP BY ALL",
+                params,
+            ).to_arrow_table().to_pandas(strings_to_categorical=True)
+            # sorted categories as astype("category") gives them, so roll-ups come out in the pandas order
+            for col in cells.columns[cells.dtypes == "category"]:
+                cells[col] = cells[col].cat.reorder_categories(sorted(cells[col].cat.categories))
+            # int16 year and renamed companies, like the pandas cube cells
+            cells = apply_schema(cells, self.company_mapping).astype({"Count": "int64"})
+            info["rows"] = len(cells)
+        return cells
+
+    def distinct_clients(self, filters):
+        where, params = self._where(filters)
+        count = "approx_count_distinct" if self.approximate_clients else "count"
+        distinct = "" if self.approximate_clients else "DISTINCT "
+        with span("filter.clients"):
+            return self._query(f'SELECT {count}({distinct}"Invoice Code") FROM sales{where}', params).fetchone()[0]
@@ -0,0 +1,267 @@
+import plotly.express as px
+
+from timings import timed
+
+# figures only ever get grouped data; anything longer than this is raw rows
+MAX_FIGURE_ROWS = 1_000
+
+# serialized figure JSON sent to the browser, per figure
+FIGURE_BUDGET_BYTES = 200_000
+
+BLUE = "#0083B8"
+PIE_COLORS = ["#084594", "#2171b5", "#4292c6", "#6baed6", "#9ecae1", "#c6dbef"]
+
+
+class FigureTooLarge(ValueError):
+    pass
+
+
+def _aggregated(data):
+    if len(data) > MAX_FIGURE_ROWS:
+        raise ValueError(
+            f"figures take pre-aggregated data, got {len(data):,} rows (max {MAX_FIGURE_ROWS:,})"
+        )
+    return data
+
+
+def figure_size(fig):
+    return len(fig.to_json())
+
+
+def check_figure_size(fig, budget_bytes=FIGURE_BUDGET_BYTES):
+    """Raise ``FigureTooLarge`` when the serialized figure exceeds ``budget_bytes``."""
+    size = figure_size(fig)
+    if size > budget_bytes:
+        title = fig.layout.title.text or "figure"
+        raise FigureTooLarge(f"{title} serializes to {size:,} bytes (budget {budget_bytes:,})")
+    return size
+
+
+@timed("figure")
+def company_bar(sales_by_company, title):
+    _aggregated(sales_by_company)
+    fig = px.bar(
+        sales_by_company,
+        x="Net Sales",
+        y=sales_by_company.index,
+        orientation="h",
+        title=title,
+        color_discrete_sequence=[BLUE] * len(sales_by_company),
+        template="plotly_white",
+        labels={"Company Name": "Company", "Net Sales": "Sales"}
+    )
+
+    fig.update_layout(
+        xaxis_title="Total sales",
+        yaxis_title="Company",
+        plot_bgcolor="rgba(0,0,0,0)",
+        xaxis=(dict(showgrid=False))
+    )
+    return fig
+
+
+@timed("figure")
+def yearly_bar(sales_by_year):
+    _aggregated(sales_by_year)
+    fig = px.bar(
+        sales_by_year,
+        x=sales_by_year.index,
+        y="Net Sales",
+        title="<b>Sales by year</b>",
+        color_discrete_sequence=[BLUE] * len(sales_by_year),
+        template="plotly_white",
+        labels={"Year": "Year", "Net Sales": "Sales"}
+    )
+    fig.update_layout(
+        xaxis_title="Year",
+        yaxis_title="Total sales",
+        xaxis=dict(tickmode="linear"),
+        plot_bgcolor="rgba(0,0,0,0)",
+        yaxis=(dict(showgrid=False)),
+    )
+    return fig
+
+
+@timed("figure")
+def product_line_bar(names, values):
+    fig = px.bar(
+        x=names,
+        y=values,
+        title="<b>Sales per product line</b>",
+        color_discrete_sequence=[BLUE] * len(names),
+        template="plotly_white",
+    )
+
+    fig.update_layout(
+        xaxis_title="Product line",
+        yaxis_title="Sales",
+        xaxis=dict(tickmode="linear"),
+        plot_bgcolor="rgba(0,0,0,0)",
+        yaxis=(dict(showgrid=False)),
+    )
+
+    fig.update_traces(
+        hovertemplate="<br>".join([
+            "Product Line: %{x}",
+            "Sales: %{y}"
+        ])
+    )
+    return fig
+
+
+@timed("figure")
+def top_n_pie(names, values, title):
+    return px.pie(
+        values=values,
+        names=names,
+        title=title,
+        color_discrete_sequence=PIE_COLORS,
+        template="plotly_white",
+    )
+
+
+@timed("figure")
+def market_pie(sales_per_market):
+    _aggregated(sales_per_market)
+    return px.pie(
+        sales_per_market,
+        values= "Net Sales",
+        names= "Market",
+        title="<b>Sales per market type</b>",
+        color_discrete_sequence=[BLUE,"#A5D7E8"],
+        template="plotly_white",
+        labels={"Market": "Market", "Net Sales": "Sales"}
+    )
+
+
+@timed("figure")
+def company_pie(sales_by_company, title):
+    _aggregated(sales_by_company)
+    return px.pie(
+        sales_by_company,
+        values= "Net Sales",
+        names= sales_by_company.index,
+        title=title,
+        color_discrete_sequence = PIE_COLORS,
+        template="plotly_white"
+    )
+
+
+@timed("figure")
+def activity_bar(sales_by_activity, title):
+    _aggregated(sales_by_activity)
+    fig = px.bar(
+        sales_by_activity,
+        x=sales_by_activity.index,
+        y="Net Sales",
+        title=title,
+        color_discrete_sequence=[BLUE] * len(sales_by_activity),
+        template="plotly_white",
+        labels={"Company Activity": "Company activity", "Net Sales": "Sales"}
+    )
+
+    fig.update_layout(
+        xaxis_title="Activity",
+        yaxis_title="Total sales",
+        plot_bgcolor="rgba(0,0,0,0)",
+        xaxis=dict(tickmode="linear"),
+        yaxis=(dict(showgrid=False))
+    )
+
+    fig.update_xaxes(categoryorder="total descending")
+    return fig
+
+
+@timed("figure")
+def monthly_line(monthly_sales, title):
+    """``monthly_sales`` has "month-year" and "Net Sales" columns in chronological order."""
+    _aggregated(monthly_sales)
+    fig = px.line(
+        monthly_sales,
+        x="month-year",
+        y="Net Sales",
+        color_discrete_sequence=[BLUE] * len(monthly_sales),
+        template="plotly_white",
+        category_orders={"month-year": monthly_sales["month-year"].tolist()},
+        labels={"month-year": "Date", "Net Sales": "Sales"}
+    )
+
+    fig.update_layout(
+        title=title,
+        width=1200
+    )
+    return fig
+
+
+@timed("figure")
+def city_map(sales_per_city, geojson_data):
+    """``sales_per_city`` has one row per governorate with "Net Sales", "lat" and "lon"."""
+    _aggregated(sales_per_city)
+    fig = px.choropleth_mapbox(
+        sales_per_city,
+        geojson=geojson_data,
+        locations="Governorate",
+        color="Net Sales",
+        # featureidkey='properties.name:fr',
+        hover_name='Governorate',
+        mapbox_style="carto-positron",
+        zoom=5.5,
+        center={"lat": 35.8, "lon": 10.2},
+        opacity=0.8,
+        labels={"Net Sales": "Sales"}
+    )
+    fig_bubble = px.scatter_mapbox(
+        sales_per_city,
+        lat="lat",
+        lon="lon",
+        color="Net Sales",
+        size="Net Sales",
+        size_max=50,
+        zoom=5.5,
+        center={"lat": 35.8, "lon": 10.2},
+        opacity=0.8,
+        color_continuous_scale="Blues",
+        hover_data={"Net Sales": True, "lat": False, "lon": False},
+        labels={"Net Sales": "Sales"}
+    )
+
+    # Add the bubble map as a new trace on top of the choropleth map
+    fig.add_trace(fig_bubble.data[0])
+
+    fig.update_layout(
+        title="<b>Sales per Tunisian City</b>",
+        margin={"r":0,"t":0,"l":0,"b":0},
+        coloraxis_showscale=False
+    )
+    return fig
+
+
+# ---- PER-VIEW FIGURES ----
+# take the dicts returned by dashboard.overall_view/local_view/export_view
+
+def overall_figures(view):
+    return {
+        "yearly_sales": yearly_bar(view["sales_by_year"]),
+        "company_sales": company_bar(view["sales_by_company"], "<b>Sales by Company</b>"),
+        "sales_per_product_line": product_line_bar(*view["sales_per_product_line"]),
+        "sales_per_market": market_pie(view["sales_per_market"]),
+    }
+
+
+def local_figures(view, geojson_data):
+    return {
+        "monthly_sales": monthly_line(view["monthly_sales"], "<b>Local Sales per Month and Year</b>"),
+        "company_sales": company_bar(view["sales_by_company"], "<b>Local Sales by Company</b>"),
+        "sales_per_product_line": top_n_pie(*view["sales_per_product_line"], "<b>Local Sales per product line</b>"),
+        "sales_per_city": city_map(view["sales_per_city"], geojson_data),
+    }
+
+
+def export_figures(view):
+    return {
+        "monthly_sales": monthly_line(view["monthly_sales"], "<b>Export Sales per Month and Year</b>"),
+        "company_sales": company_pie(view["sales_by_company"], "<b>Export Sales by company</b>"),
+        "sales_by_activity": activity_bar(view["sales_by_activity"], "<b>Export Sales by activity</b>"),
+        "sales_per_product_line": top_n_pie(*view["sales_per_product_line"], "<b>Export Sales per product line</b>"),
+        "sales_per_product_range": top_n_pie(*view["sales_per_product_range"], "<b>Export Sales per product range</b>"),
+    }
@@ -0,0 +1,62 @@
+import numpy as np
+
+# sidebar multiselects, in the order they are applied
+FILTER_COLUMNS = ["Company Name", "Year", "Company Activity"]
+
+
+class FilterIndex:
+    """Per-value boolean bitmaps over the sidebar filter columns.
+
+    Built once on the cached frame. A selection ORs the bitmaps of the chosen
+    values inside each column and ANDs the columns together, which gives the
+    same rows as the ``df.query("`Company Name` == @company and ...")`` call it
+    replaces without scanning the full columns on every rerun.
+    """
+
+    def __init__(self, df, columns=FILTER_COLUMNS):
+        self.columns = list(columns)
+        self.n_rows = len(df)
+        self.bitmaps = {}
+        for col in self.columns:
+            bitmaps = {}
+            for value, positions in df.groupby(col, observed=True, sort=False, dropna=False).indices.items():
+                bitmap = np.zeros(self.n_rows, dtype=bool)
+                bitmap[positions] = True
+                bitmaps[value] = bitmap
+            self.bitmaps[col] = bitmaps
+
+    def _length(self, rows):
+        if isinstance(rows, slice):
+            return len(range(*rows.indices(self.n_rows)))
+        return len(rows)
+
+    def column_mask(self, col, values, rows=slice(None)):
+        bitmaps = self.bitmaps[col]
+        values = set(values)
+        if len(values) >= len(bitmaps) and values.issuperset(bitmaps):
+            # every value selected, the column does not restrict anything
+            return None
+        mask = np.zeros(self._length(rows), dtype=bool)
+        for value in values:
+            bitmap = bitmaps.get(value)
+            if bitmap is not None:
+                mask |= bitmap[rows]
+        return mask
+
+    def mask(self, selection, rows=slice(None)):
+        """Boolean row mask for ``selection``, a dict of column -> selected values.
+
+        ``rows`` (a slice or positions, e.g. from ``DateIndex.rows``) limits
+        the mask to those rows, in that order.
+        """
+        mask = np.ones(self._length(rows), dtype=bool)
+        for col in self.columns:
+            if col not in selection:
+                continue
+            col_mask = self.column_mask(col, selection[col], rows)
+            if col_mask is not None:
+                mask &= col_mask
+        return mask
+
+    def select(self, df, selection):
+        return df[self.mask(selection)]
@@ -1,14 +1,9 @@
-import pickle
-from pathlib import Path
-
-import streamlit_authenticator as stauth
+from users import UserStore
 
 names = ["Soumaya Jendoubi", "Client X"]
 usernames = ["soumaya", "clientx"]
 passwords = ["pfe2023", "sales_374"]
 
-hashed_passwords = stauth.Hasher(passwords).generate()
-
-file_path = Path(__file__).parent / "hashed_pw.pkl"
-with file_path.open("wb") as file:
-    pickle.dump(hashed_passwords, file)
\ No newline at end of file
+# hashed in parallel and stored in users.db; for many users use
+# `python -m users provision users.csv`
+UserStore().provision(zip(usernames, names, passwords))
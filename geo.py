@@ -0,0 +1,122 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+GEOJSON_PATH = "gov.geojson"
+
+CITY_COORDINATES = {
+    'TUNIS': {'lat': 36.8065, 'lon': 10.1815},
+    'SFAX': {'lat': 34.7406, 'lon': 10.7604},
+    'SOUSSE': {'lat': 35.8288, 'lon': 10.6405},
+    'ARIANA': {'lat': 36.8625, 'lon': 10.1944},
+    'BEN AROUS': {'lat': 36.7531, 'lon': 10.2137},
+    'BIZERTE': {'lat': 37.2628, 'lon': 9.8739},
+    'BEJA': {'lat': 36.725, 'lon': 9.1814},
+    'GABES': {'lat': 33.8825, 'lon': 10.1167},
+    'GAFSA': {'lat': 34.425, 'lon': 8.7842},
+    'JENDOUBA': {'lat': 36.5019, 'lon': 8.7761},
+    'KAIROUAN': {'lat': 35.6786, 'lon': 10.0944},
+    'KASSERINE': {'lat': 35.1683, 'lon': 8.8308},
+    'KEBILI': {'lat': 33.7022, 'lon': 8.9691},
+    'KEF': {'lat': 36.1829, 'lon': 8.7142},
+    'MAHDIA': {'lat': 35.5014, 'lon': 11.0623},
+    'MANOUBA': {'lat': 36.8089, 'lon': 10.0992},
+    'Manouba': {'lat': 36.8089, 'lon': 10.0992},
+    'MEDNINE': {'lat': 33.3542, 'lon': 10.4978},
+    'MONASTIR': {'lat': 35.7878, 'lon': 10.8272},
+    'NABEUL': {'lat': 36.4602, 'lon': 10.7345},
+    'SIDI BOUZID': {'lat': 35.0317, 'lon': 9.4916},
+    'SILIANA': {'lat': 36.0833, 'lon': 9.375},
+    'TATAOUINE': {'lat': 32.9397, 'lon': 10.4511},
+    'TOZEUR': {'lat': 33.9209, 'lon': 8.1339},
+    'ZAGHOUAN': {'lat': 36.4012, 'lon': 10.1424}
+}
+
+# degrees; at zoom 5.5 over Tunisia one screen pixel is roughly 0.025 degrees
+SIMPLIFY_TOLERANCE = 0.01
+
+
+def _simplify_line(points, tolerance):
+    """Douglas-Peucker on an (n, 2) array, keeping both end points."""
+    n = len(points)
+    if n < 3:
+        return points
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end <= start + 1:
+            continue
+        a, b = points[start], points[end]
+        segment = points[start + 1:end]
+        ab = b - a
+        length = np.hypot(*ab)
+        if length == 0:
+            dist = np.hypot(*(segment - a).T)
+        else:
+            dist = np.abs(ab[0] * (segment[:, 1] - a[1]) - ab[1] * (segment[:, 0] - a[0])) / length
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            mid = start + 1 + i
+            keep[mid] = True
+            stack.append((start, mid))
+            stack.append((mid, end))
+    return points[keep]
+
+
+def _simplify_ring(ring, tolerance):
+    points = np.asarray(ring, dtype=float)
+    simplified = _simplify_line(points, tolerance)
+    if len(simplified) < 4:
+        # a closed ring needs 4 positions, keep the original rather than collapse it
+        return ring
+    return simplified.round(5).tolist()
+
+
+def simplify_geometry(geometry, tolerance=SIMPLIFY_TOLERANCE):
+    if geometry["type"] == "Polygon":
+        geometry["coordinates"] = [_simplify_ring(r, tolerance) for r in geometry["coordinates"]]
+    elif geometry["type"] == "MultiPolygon":
+        geometry["coordinates"] = [
+            [_simplify_ring(r, tolerance) for r in polygon] for polygon in geometry["coordinates"]
+        ]
+    return geometry
+
+
+def prepare_geojson(path=GEOJSON_PATH, tolerance=SIMPLIFY_TOLERANCE):
+    """Governorate boundaries ready for the map: upper-case names, simplified polygons.
+
+    Meant to run once per process (``st.cache_resource``) or at build time,
+    never on a rerun.
+    """
+    with open(path, 'r', encoding='utf-8') as j:
+        geojson_data = json.load(j)
+
+    for feature in geojson_data['features']:
+        properties = feature['properties']
+        for key in ('name', 'name:fr'):
+            if isinstance(properties.get(key), str):
+                properties[key] = properties[key].upper()
+        if tolerance and feature.get('geometry'):
+            simplify_geometry(feature['geometry'], tolerance)
+
+    return geojson_data
+
+
+def attach_coordinates(sales):
+    """Add lat/lon columns to a frame indexed by governorate, as one vectorized lookup."""
+    coordinates = pd.DataFrame.from_dict(CITY_COORDINATES, orient="index")
+    located = coordinates.reindex(sales.index.astype(str))
+    return sales.assign(lat=located["lat"].to_numpy(), lon=located["lon"].to_numpy())
+
+
+if __name__ == "__main__":
+    # build-time variant: write the prepared boundaries next to the source
+    import sys
+
+    source = sys.argv[1] if len(sys.argv) > 1 else GEOJSON_PATH
+    target = sys.argv[2] if len(sys.argv) > 2 else "gov_modified.geojson"
+    with open(target, 'w', encoding='utf-8') as j:
+        json.dump(prepare_geojson(source), j)
@@ -0,0 +1,367 @@
+import hashlib
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from schema import INVOICE_DATE_FORMAT
+
+EXCEL_PATH = "data clean complete2.xlsx"
+CACHE_DIR = Path(__file__).parent / ".cache"
+# daily exports appended to the store, next to the workbook
+INCREMENTS_DIR = "increments"
+# processes parsing row ranges of the workbook on a cold load
+READ_WORKERS = os.cpu_count() or 1
+# usecols="A:N"
+MAX_COLUMN = 14
+
+_ROW_TAG = re.compile(rb'<row\b[^>]*?\br="(\d+)"')
+_SHEET_DATA = b"<sheetData>"
+_SHEET_DATA_END = b"</sheetData>"
+# decompressed bytes of the sheet xml read at a time
+_CHUNK_SIZE = 1 << 20
+# longer than any <row ...> opening tag
+_TAG_MARGIN = 1024
+
+
+def read_excel(path=EXCEL_PATH, nrows=356639):
+    return pd.read_excel(
+            io=path,
+            engine="openpyxl",
+            sheet_name="data",
+            skiprows=0,
+            usecols="A:N",
+            nrows=nrows
+        )
+
+
+def _scan_rows(path, member, last_row=None):
+    """``(head, rows, data_end)`` of the sheet xml, decompressed a chunk at a time.
+
+    ``head`` is the xml up to and with ``<sheetData>``, ``rows`` the
+    ``(byte offset, row number)`` of every ``<row>`` tag, stopping at the
+    first one past ``last_row``, and ``data_end`` the offset where the rows
+    end. Only one chunk of the sheet is held at a time.
+    """
+    head, rows = None, []
+    # buffer[0] is at byte ``base`` of the sheet
+    buffer, base = b"", 0
+    with zipfile.ZipFile(path) as archive, archive.open(member) as xml:
+        while True:
+            chunk = xml.read(_CHUNK_SIZE)
+            buffer += chunk
+            if head is None:
+                at = buffer.find(_SHEET_DATA)
+                if at < 0:
+                    if not chunk:
+                        return None, rows, -1
+                    continue
+                head = buffer[:at + len(_SHEET_DATA)]
+            data_end = buffer.find(_SHEET_DATA_END)
+            if data_end >= 0:
+                limit = data_end
+            elif chunk:
+                # a tag in the last bytes may be cut, it is matched with the next chunk
+                limit = max(len(buffer) - _TAG_MARGIN, 0)
+            else:
+                limit = len(buffer)
+            for m in _ROW_TAG.finditer(buffer):
+                if m.start() >= limit:
+                    break
+                rows.append((base + m.start(), int(m.group(1))))
+                if last_row is not None and rows[-1][1] > last_row:
+                    return head, rows, base + m.start()
+            if data_end >= 0:
+                return head, rows, base + data_end
+            if not chunk:
+                return head, rows, -1
+            buffer, base = buffer[limit:], base + limit
+
+
+def _read_row_range(path, sheet_name, member, head, start, end, min_row, max_row):
+    # decompressed from the top, deflate cannot seek, but only bytes start..end are kept
+    piece, offset = [head], 0
+    with zipfile.ZipFile(path) as archive, archive.open(member) as xml:
+        while offset < end:
+            chunk = xml.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            lo, hi = max(start - offset, 0), min(end - offset, len(chunk))
+            if lo < hi:
+                piece.append(chunk[lo:hi])
+            offset += len(chunk)
+    piece.append(_SHEET_DATA_END + b"</worksheet>")
+    piece = b"".join(piece)
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name]
+        # stream only this slice of the sheet xml, not every row above it
+        # (openpyxl internals, hence the 3.1.x pin in requirements.txt)
+        ws._get_source = lambda: io.BytesIO(piece)
+        return list(ws.iter_rows(min_row=min_row, max_row=max_row, max_col=MAX_COLUMN, values_only=True))
+    finally:
+        wb.close()
+
+
+def read_excel_parallel(path=EXCEL_PATH, nrows=356639, workers=READ_WORKERS, sheet_name="data"):
+    """``read_excel`` with the rows split in ranges parsed by a process pool.
+
+    Each worker decompresses the sheet xml itself, keeps its own byte range
+    and streams it through openpyxl's read-only parser, so a cold load
+    scales with the cores instead of being one openpyxl pass and no process
+    holds the whole sheet. Falls back to ``read_excel`` with a single worker
+    or a sheet whose rows carry no ``r`` attribute.
+    """
+    if workers <= 1:
+        return read_excel(path, nrows)
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name]
+        member = ws._worksheet_path
+        header = next(ws.iter_rows(min_row=1, max_row=1, max_col=MAX_COLUMN, values_only=True))
+    finally:
+        wb.close()
+
+    head, rows, data_end = _scan_rows(path, member, nrows + 1 if nrows else None)
+    if head is None or not rows or data_end < 0:
+        return read_excel(path, nrows)
+    last_row = nrows + 1 if nrows else rows[-1][1]
+    selected = [i for i, (_, r) in enumerate(rows) if 2 <= r <= last_row]
+    if not selected:
+        return pd.DataFrame(columns=header)
+
+    first, last = selected[0], selected[-1]
+    step = -(-len(selected) // workers)
+    tasks = []
+    for i in range(first, last + 1, step):
+        j = min(i + step, last + 1)
+        end = rows[j][0] if j < len(rows) else data_end
+        tasks.append((path, sheet_name, member, head, rows[i][0], end, rows[i][1], rows[j - 1][1]))
+
+    # spawn, forking a server process with live threads is not safe
+    with ProcessPoolExecutor(len(tasks), mp_context=multiprocessing.get_context("spawn")) as pool:
+        parts = list(pool.map(_read_row_range, *zip(*tasks)))
+    return pd.DataFrame.from_records(itertools.chain.from_iterable(parts), columns=header)
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_paths(path, cache_dir):
+    stem = Path(path).stem.replace(" ", "_")
+    return cache_dir / f"{stem}.parquet", cache_dir / f"{stem}.json"
+
+
+def _write_parquet(df, parquet_path):
+    try:
+        df.to_parquet(parquet_path, index=False)
+    except (TypeError, ValueError):
+        # openpyxl can hand back mixed int/str object columns (e.g. codes), which arrow refuses
+        df = df.copy()
+        for col in df.columns[df.dtypes == object]:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+        df.to_parquet(parquet_path, index=False)
+
+
+def _invoice_dates(df):
+    dates = df["Invoice Date"]
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates
+    return pd.to_datetime(dates, format=INVOICE_DATE_FORMAT)
+
+
+def high_water_mark(df):
+    """Latest invoice date in ``df`` and the invoice codes already seen on it."""
+    dates = _invoice_dates(df)
+    last = dates.max()
+    codes = df.loc[dates == last, "Invoice Code"].astype(str).unique()
+    return {"invoice_date": last.isoformat(), "invoice_codes": sorted(codes.tolist())}
+
+
+def rows_after(df, mark):
+    """Rows of ``df`` past the high-water ``mark``: later dates, or unseen codes on its date."""
+    dates = _invoice_dates(df)
+    last = pd.Timestamp(mark["invoice_date"])
+    seen = df["Invoice Code"].astype(str).isin(mark["invoice_codes"])
+    return df[(dates > last) | ((dates == last) & ~seen)]
+
+
+def _advance(mark, new_mark):
+    # same last date: keep the codes from both, or old ones would count as new again
+    if new_mark["invoice_date"] == mark["invoice_date"]:
+        codes = set(mark["invoice_codes"]) | set(new_mark["invoice_codes"])
+        return {"invoice_date": mark["invoice_date"], "invoice_codes": sorted(codes)}
+    return new_mark
+
+
+def _load_base(path, cache_dir):
+    """The manifest of the main workbook's Parquet copy, converting it only when it changed.
+
+    The manifest holds the source mtime and sha256; the workbook is only hashed
+    again when its mtime moves. A rebuilt base starts with no increments.
+    """
+    parquet_path, manifest_path = _cache_paths(path, cache_dir)
+    stat = Path(path).stat()
+
+    manifest = None
+    if parquet_path.exists() and manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text())
+        # manifests written before increments existed have no high-water mark, convert again
+        if "increments" not in manifest:
+            manifest = None
+        elif manifest["mtime_ns"] == stat.st_mtime_ns and manifest["size"] == stat.st_size:
+            return manifest
+
+    sha256 = file_sha256(path)
+    if manifest is not None and manifest["sha256"] == sha256:
+        # touched but unchanged: refresh the manifest and keep the cached columns
+        manifest.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        manifest_path.write_text(json.dumps(manifest))
+        return manifest
+
+    df = read_excel_parallel(path)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    _write_parquet(df, parquet_path)
+    df = pd.read_parquet(parquet_path)
+    manifest = {
+        "source": str(path),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": sha256,
+        "high_water_mark": high_water_mark(df),
+        "increments": [],
+    }
+    manifest_path.write_text(json.dumps(manifest))
+    return manifest
+
+
+def _ingest_increments(path, cache_dir, manifest):
+    increments_dir = Path(path).parent / INCREMENTS_DIR
+    if not increments_dir.is_dir():
+        return
+    done = {entry["file"] for entry in manifest["increments"]}
+    pending = sorted(f for f in increments_dir.glob("*.xlsx") if f.name not in done)
+    if not pending:
+        return
+
+    _, manifest_path = _cache_paths(path, cache_dir)
+    stem = Path(path).stem.replace(" ", "_")
+    for source in pending:
+        rows = rows_after(read_excel(source, nrows=None), manifest["high_water_mark"])
+        entry = {"file": source.name, "sha256": file_sha256(source), "rows": len(rows), "parquet": None}
+        if len(rows):
+            part = cache_dir / f"{stem}.part-{len(manifest['increments']):05d}.parquet"
+            _write_parquet(rows, part)
+            rows = pd.read_parquet(part)
+            entry["parquet"] = part.name
+            manifest["high_water_mark"] = _advance(manifest["high_water_mark"], high_water_mark(rows))
+        manifest["increments"].append(entry)
+        # after every file, so a crash never re-ingests what is already stored
+        manifest_path.write_text(json.dumps(manifest))
+
+
+def _parts(cache_dir, parquet_path, manifest):
+    return [parquet_path] + [
+        cache_dir / entry["parquet"] for entry in manifest["increments"] if entry["parquet"]
+    ]
+
+
+def store_parts(path=EXCEL_PATH, cache_dir=CACHE_DIR):
+    """``(version, parts)``: the Parquet files of the workbook and its increments, in load order.
+
+    Converts whatever is new first, like ``load_sales_data``, but reads
+    nothing back. ``version`` is the workbook's sha256 and the number of
+    parts; a process that loaded these parts passes it to ``ingest_increments``.
+    """
+    cache_dir = Path(cache_dir)
+    manifest = _load_base(path, cache_dir)
+    _ingest_increments(path, cache_dir, manifest)
+    parquet_path, _ = _cache_paths(path, cache_dir)
+    parts = _parts(cache_dir, parquet_path, manifest)
+    return (manifest["sha256"], len(parts)), parts
+
+
+def parquet_parts(path=EXCEL_PATH, cache_dir=CACHE_DIR):
+    """Parquet files of the workbook and its increments; for engines that scan the files themselves."""
+    return store_parts(path, cache_dir)[1]
+
+
+def read_parts(parts):
+    return pd.concat([pd.read_parquet(part) for part in parts], ignore_index=True)
+
+
+def ingest_increments(version, path=EXCEL_PATH, cache_dir=CACHE_DIR):
+    """Add new daily exports to the columnar store; returns ``(rows, version)``.
+
+    Files dropped in the ``increments/`` folder next to the workbook (same
+    "data" sheet layout) are read once each. Only rows past the stored
+    "Invoice Date"/"Invoice Code" high-water mark are kept and written as a
+    new Parquet part, so the cost follows the size of the new export, not
+    the history.
+
+    ``version`` (from ``store_parts`` or the previous call) says which parts
+    the caller already has: ``rows`` are those of the parts after them,
+    including parts another process ingested first, and an empty frame when
+    there are none. ``rows`` is ``None`` when the workbook itself changed
+    and everything must be reloaded.
+    """
+    current, parts = store_parts(path, cache_dir)
+    sha256, loaded = version
+    if current[0] != sha256:
+        return None, current
+    if len(parts) == loaded:
+        return pd.DataFrame(), current
+    return read_parts(parts[loaded:]), current
+
+
+def load_sales_data(path=EXCEL_PATH, cache_dir=CACHE_DIR):
+    """Load the sales workbook plus its increments from the columnar store.
+
+    The workbook goes through openpyxl only when it changed (see
+    ``_load_base``); increments not seen before are ingested first.
+    """
+    return read_parts(store_parts(path, cache_dir)[1])
+
+
+if __name__ == "__main__":
+    # cold Excel parse vs warm columnar load
+    import sys
+
+    source = sys.argv[1] if len(sys.argv) > 1 else EXCEL_PATH
+
+    start = time.perf_counter()
+    df = read_excel(source)
+    cold = time.perf_counter() - start
+
+    load_sales_data(source)
+
+    start = time.perf_counter()
+    df = load_sales_data(source)
+    warm = time.perf_counter() - start
+
+    print(f"rows:                {len(df):,}")
+    print(f"cold excel load:     {cold:.3f} s")
+    print(f"warm parquet load:   {warm:.3f} s")
+    print(f"speedup:             {cold / warm:.1f}x")
+
+    from schema import apply_schema
+
+    typed = apply_schema(df)
+    print(f"memory before schema: {typed.attrs['memory_mb']['before']:.1f} MB")
+    print(f"memory after schema:  {typed.attrs['memory_mb']['after']:.1f} MB")
@@ -0,0 +1,66 @@
+import threading
+from collections import OrderedDict
+
+
+def _plain(value):
+    # numpy scalars from the multiselect options -> python, so keys compare and hash the same
+    return value.item() if hasattr(value, "item") else value
+
+
+def filter_key(filters):
+    """Canonical, hashable form of a filter spec: sorted columns, sorted unique values."""
+    return tuple(
+        (col, tuple(sorted({_plain(v) for v in values}, key=lambda v: (type(v).__name__, v))))
+        for col, values in sorted(filters.items())
+    )
+
+
+class LRUCache:
+    """Size-bounded, thread-safe LRU map with hit/miss counters.
+
+    Held process-wide, so every Streamlit session (one thread each) shares
+    the entries.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # bumped by clear(), a value computed from the data before it is not stored
+        self._generation = 0
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            generation = self._generation
+
+        # computed outside the lock; two sessions missing the same key both compute it
+        value = compute()
+
+        with self._lock:
+            if generation != self._generation:
+                # cleared while computing, the value may predate the change
+                return value
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._generation += 1
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize}
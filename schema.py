@@ -0,0 +1,101 @@
+import pandas as pd
+
+# low-cardinality text columns, stored as pandas categoricals
+CATEGORY_COLUMNS = [
+    "Company Name",
+    "Company Activity",
+    "Product Line",
+    "Product Range",
+    "Market",
+    "Governorate",
+    "Invoice Code",
+]
+
+YEAR_DTYPE = "int16"
+NET_SALES_DTYPE = "float64"
+INVOICE_DATE_FORMAT = "%d/%m/%Y"
+
+# rename companies
+COMPANY_MAPPING = {'GPA': 'Company X1', 'CMS': 'Company X2', 'CAP': 'Company X3', 'ACS': 'Company X4'}
+
+
+def memory_usage_mb(df):
+    return float(df.memory_usage(deep=True).sum() / 2**20)
+
+
+def apply_schema(df, company_mapping=COMPANY_MAPPING):
+    """Cast the raw sales frame to its compact dtypes.
+
+    Text dimensions become categoricals, "Year" a small int, "Net Sales" a
+    float64 and "Invoice Date" a datetime64 parsed once. The company rename is
+    done on the categories, not on every row. Memory use before and after is
+    kept in ``df.attrs["memory_mb"]``.
+    """
+    before = memory_usage_mb(df)
+    df = df.copy()
+
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+
+    if company_mapping and "Company Name" in df.columns:
+        categories = df["Company Name"].cat.categories
+        renames = {k: v for k, v in company_mapping.items() if k in categories}
+        if renames:
+            df["Company Name"] = df["Company Name"].cat.rename_categories(renames)
+
+    if "Year" in df.columns:
+        df["Year"] = df["Year"].astype(YEAR_DTYPE)
+    if "Net Sales" in df.columns:
+        df["Net Sales"] = df["Net Sales"].astype(NET_SALES_DTYPE)
+    if "Invoice Date" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["Invoice Date"]):
+        df["Invoice Date"] = pd.to_datetime(df["Invoice Date"], format=INVOICE_DATE_FORMAT)
+
+    df.attrs["memory_mb"] = {"before": before, "after": memory_usage_mb(df)}
+    return df
+
+
+def _categorical_columns(df):
+    return [col for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)]
+
+
+def extend_categories(df, new_rows):
+    """``new_rows`` with the categories of ``df`` followed by the ones it adds.
+
+    ``df`` is left as it is: its codes still point at the same values in the
+    longer categories, so the two share one set of codes without the
+    existing rows being recoded.
+    """
+    new_rows = new_rows.copy(deep=False)
+    for col in _categorical_columns(df):
+        if col not in new_rows.columns:
+            continue
+        categories = df[col].cat.categories
+        added = new_rows[col].cat.categories.difference(categories)
+        if len(added):
+            categories = categories.append(added)
+        new_rows[col] = new_rows[col].cat.set_categories(categories)
+    return new_rows
+
+
+def concat_categorical(frames, ignore_index=False):
+    """``pd.concat`` that keeps categorical columns categorical.
+
+    Each categorical column gets the union of the frames' categories, in
+    order of appearance, instead of falling back to plain values when the
+    categories differ (e.g. chunks loaded before and after new values came in).
+    """
+    frames = list(frames)
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True) if ignore_index else frames[0]
+    frames = [frame.copy(deep=False) for frame in frames]
+    for col in _categorical_columns(frames[0]):
+        categories = frames[0][col].cat.categories
+        for frame in frames[1:]:
+            added = frame[col].cat.categories.difference(categories)
+            if len(added):
+                categories = categories.append(added)
+        for frame in frames:
+            if not frame[col].cat.categories.equals(categories):
+                frame[col] = frame[col].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=ignore_index)
@@ -0,0 +1,74 @@
+"""The typed sales frame, stored once per host as a memory-mapped Arrow file.
+
+``st.cache_resource`` keeps one ``SalesData`` per process for every session;
+this keeps one copy of the rows per host. The typed frame is written once as
+an uncompressed Arrow IPC file in the Parquet cache directory, and each
+process (Streamlit server, benchmark, worker) maps it read-only: numeric
+columns and categorical codes are numpy views on the mapping, so the pages
+live in the OS page cache and are shared instead of copied.
+"""
+import hashlib
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+from pyarrow import ipc
+
+from ingestion import CACHE_DIR, EXCEL_PATH, parquet_parts
+
+
+def shared_frame_path(path=EXCEL_PATH, cache_dir=CACHE_DIR, parts=None):
+    """Arrow file for the workbook and increments in ``parts``; the name changes with them.
+
+    ``parts`` defaults to the current ``parquet_parts``.
+    """
+    if parts is None:
+        parts = parquet_parts(path, cache_dir)
+    digest = hashlib.sha256()
+    for part in parts:
+        stat = part.stat()
+        digest.update(f"{part.name}:{stat.st_mtime_ns}:{stat.st_size}\n".encode())
+    stem = Path(path).stem.replace(" ", "_")
+    return Path(cache_dir) / f"{stem}.{digest.hexdigest()[:16]}.arrow"
+
+
+def write_shared_frame(df, arrow_path):
+    table = pa.Table.from_pandas(df, preserve_index=False).combine_chunks()
+    for i, name in enumerate(table.column_names):
+        if pd.api.types.is_float_dtype(df[name].dtype):
+            # NaN kept as a value, not turned into a null, so the column maps back without a copy
+            table = table.set_column(i, name, pa.array(df[name].to_numpy(), from_pandas=False))
+
+    arrow_path = Path(arrow_path)
+    tmp = arrow_path.with_suffix(f".{os.getpid()}.tmp")
+    with pa.OSFile(str(tmp), "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    # atomic, another process never maps a half-written file
+    os.replace(tmp, arrow_path)
+
+    # older versions; processes still mapping them keep their pages until they reload
+    for stale in arrow_path.parent.glob(arrow_path.name.split(".")[0] + ".*.arrow"):
+        if stale != arrow_path:
+            stale.unlink(missing_ok=True)
+
+
+def _column(array):
+    if pa.types.is_dictionary(array.type):
+        indices = array.indices
+        if array.null_count:
+            indices = indices.fill_null(-1)
+        return pd.Categorical.from_codes(
+            indices.to_numpy(zero_copy_only=False),
+            categories=array.dictionary.to_pandas(),
+            validate=False,
+        )
+    # a view on the mapping unless the column has nulls (e.g. NaT dates)
+    return array.to_numpy(zero_copy_only=False)
+
+
+def map_shared_frame(arrow_path):
+    """DataFrame over the read-only mapping of ``arrow_path``; only categories are copied."""
+    table = ipc.open_file(pa.memory_map(str(arrow_path))).read_all()
+    columns = {name: _column(table.column(name).combine_chunks()) for name in table.column_names}
+    return pd.DataFrame(columns, copy=False)
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+from filter_index import FILTER_COLUMNS, FilterIndex
+
+# 2**14 registers: standard error 1.04 / sqrt(2**14) ~ 0.81%, so about 95% of
+# estimates fall within +-1.6% of the exact count
+HLL_PRECISION = 14
+
+
+def hash_values(values):
+    """64-bit hashes of the values' string form, the same for a value in any frame."""
+    return pd.util.hash_array(np.asarray(values, dtype=object).astype(str).astype(object))
+
+
+def _bit_length(x):
+    x = x.copy()
+    n = np.zeros(x.shape, dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        big = x >= np.uint64(1 << shift)
+        n[big] += shift
+        x[big] >>= np.uint64(shift)
+    return n + (x > 0)
+
+
+def hll_registers(hashes, groups, n_groups, precision=HLL_PRECISION):
+    """HyperLogLog registers, one row of ``2**precision`` per group id in ``groups``."""
+    registers = np.zeros((n_groups, 1 << precision), dtype=np.uint8)
+    bucket = (hashes >> np.uint64(64 - precision)).astype(np.intp)
+    rest = hashes & np.uint64((1 << (64 - precision)) - 1)
+    # position of the first 1-bit in the remaining 64 - precision bits
+    rank = (64 - precision + 1 - _bit_length(rest)).astype(np.uint8)
+    np.maximum.at(registers, (groups, bucket), rank)
+    return registers
+
+
+def hll_estimate(registers):
+    """Distinct count from one row of registers (merge first with ``max(axis=0)``)."""
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    zeros = np.count_nonzero(registers == 0)
+    if estimate <= 2.5 * m and zeros:
+        # small range: linear counting is more accurate
+        estimate = m * np.log(m / zeros)
+    return estimate
+
+
+class DistinctSketches:
+    """Mergeable HyperLogLog sketches of a column, one per filter partition.
+
+    A partition is one observed combination of ``FILTER_COLUMNS`` values
+    (company x year x activity). The distinct count for a selection merges
+    the registers of the matching partitions, so it never touches the rows.
+    Approximate: see ``HLL_PRECISION`` for the error bound.
+    """
+
+    def __init__(self, df, column="Invoice Code", precision=HLL_PRECISION):
+        self.column = column
+        self.precision = precision
+        groups = df.groupby(FILTER_COLUMNS, observed=True, dropna=False, sort=False)
+        self.partitions = groups.size().index.to_frame(index=False)
+        group_ids = groups.ngroup().to_numpy()
+
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # one hash per category instead of one per row
+            codes = values.cat.codes.to_numpy()
+            hashes = hash_values(values.cat.categories)[codes]
+            keep = codes >= 0
+        else:
+            hashes = hash_values(values)
+            keep = values.notna().to_numpy()
+        self.registers = hll_registers(hashes[keep], group_ids[keep], len(self.partitions), precision)
+        self.index = FilterIndex(self.partitions)
+
+    def merged_registers(self, selection):
+        """Registers of the partitions in ``selection`` merged into one row, None when none match.
+
+        Rows from sketches of other rows merge the same way (``np.maximum``).
+        """
+        mask = self.index.mask(selection)
+        if not mask.any():
+            return None
+        return self.registers[mask].max(axis=0)
+
+    def estimate(self, selection):
+        registers = self.merged_registers(selection)
+        if registers is None:
+            return 0
+        return int(round(hll_estimate(registers)))
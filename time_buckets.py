@@ -0,0 +1,24 @@
+import calendar
+
+import numpy as np
+
+MONTH_COLUMN = "Month"
+
+
+def month_key(dates):
+    """Integer month bucket (``year * 12 + month - 1``) of a datetime64 series.
+
+    Keys sort chronologically, so groupby and ordering need no string parsing.
+    """
+    return (dates.dt.year * 12 + dates.dt.month - 1).astype("int32")
+
+
+def add_month_key(df, date_column="Invoice Date"):
+    df[MONTH_COLUMN] = month_key(df[date_column])
+    return df
+
+
+def month_labels(keys):
+    """Month labels ("%B %Y") for month keys, only meant for the handful of output rows."""
+    keys = np.asarray(keys, dtype=np.int64)
+    return [f"{calendar.month_name[k % 12 + 1]} {k // 12}" for k in keys]
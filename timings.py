@@ -0,0 +1,122 @@
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+import pandas as pd
+
+# spans kept per process, oldest dropped first
+TIMINGS_BUFFER_SIZE = 5_000
+
+
+def _rows(args):
+    # row count of the first frame argument, the input size of an aggregation or figure
+    return next((len(arg) for arg in args if hasattr(arg, "shape")), None)
+
+
+class Timings:
+    """Ring buffer of named timing spans, shared by every session of the process.
+
+    Each span records its stage, wall seconds, an optional row count and the
+    rerun it ran in (``start_rerun`` tags the calling thread, Streamlit runs
+    each script run in its own), so a slow rerun can be broken down by stage.
+    Fragment-only reruns are recorded as ``rerun.fragment`` (see ``rerun``).
+    """
+
+    def __init__(self, maxlen=TIMINGS_BUFFER_SIZE):
+        self.records = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._reruns = itertools.count(1)
+
+    def start_rerun(self):
+        self._local.rerun = next(self._reruns)
+        self._local.start = time.perf_counter()
+
+    def end_rerun(self, stage="rerun"):
+        start = getattr(self._local, "start", None)
+        if start is not None:
+            self.record(stage, time.perf_counter() - start)
+            self._local.start = None
+
+    @contextmanager
+    def rerun(self, stage="rerun"):
+        """Time the block as a rerun of its own, unless a rerun is already running.
+
+        For ``st.fragment`` functions: run alone (tab switch, widget inside
+        the fragment) they get a rerun id and total; called from the full
+        script run, they are part of that rerun.
+        """
+        if getattr(self._local, "start", None) is not None:
+            yield
+            return
+        self.start_rerun()
+        try:
+            yield
+        finally:
+            self.end_rerun(stage)
+
+    def record(self, stage, seconds, rows=None):
+        entry = {
+            "stage": stage,
+            "seconds": seconds,
+            "rows": rows,
+            "rerun": getattr(self._local, "rerun", None),
+            "timestamp": time.time(),
+        }
+        with self._lock:
+            self.records.append(entry)
+
+    @contextmanager
+    def span(self, stage, rows=None):
+        """Time the block as ``stage``; set ``info["rows"]`` inside it to record a row count."""
+        info = {"rows": rows}
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            self.record(stage, time.perf_counter() - start, info["rows"])
+
+    def timed(self, prefix):
+        """Decorator recording each call as ``prefix.<function name>``."""
+        def decorate(fn):
+            stage = f"{prefix}.{fn.__name__}"
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(stage, _rows(args)):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.records)
+
+    def summary(self):
+        """p50/p95 seconds, call count and median rows per stage over the buffered spans."""
+        spans = pd.DataFrame(self.snapshot(), columns=["stage", "seconds", "rows", "rerun", "timestamp"])
+        grouped = spans.groupby("stage")
+        summary = pd.DataFrame({
+            "p50_ms": grouped["seconds"].quantile(0.5) * 1000,
+            "p95_ms": grouped["seconds"].quantile(0.95) * 1000,
+            "calls": grouped.size(),
+            "rows": grouped["rows"].median(),
+        })
+        return summary.sort_values("p95_ms", ascending=False)
+
+    def to_json_lines(self):
+        return "".join(json.dumps(entry) + "\n" for entry in self.snapshot())
+
+    def export(self, path):
+        with open(path, "a") as f:
+            f.write(self.to_json_lines())
+
+
+# process-wide, like the view cache
+TIMINGS = Timings()
+span = TIMINGS.span
+timed = TIMINGS.timed
@@ -0,0 +1,156 @@
+"""Dashboard users in a local SQLite database, looked up by username.
+
+    python -m users provision clients.csv --workers 8
+
+Replaces the ``hashed_pw.pkl`` list zipped with hard-coded usernames: the
+app opens the store once per process and reads the credentials in one
+query, again only when ``version`` says users were written. Provisioning takes a CSV with
+``username,name,password`` columns and hashes the passwords with bcrypt
+across a process pool, so hundreds of users take seconds, not minutes.
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import bcrypt
+
+USERS_DB = Path(__file__).parent / "users.db"
+# written by generate_keys.py before the store, imported on first open
+LEGACY_PICKLE = Path(__file__).parent / "hashed_pw.pkl"
+LEGACY_USERS = [("soumaya", "Soumaya Jendoubi"), ("clientx", "Client X")]
+# bcrypt cost, ~0.25 s per hash: what streamlit_authenticator's Hasher uses
+BCRYPT_ROUNDS = 12
+HASH_WORKERS = os.cpu_count() or 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    password TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def hash_password(password, rounds=BCRYPT_ROUNDS):
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+
+
+def hash_passwords(passwords, workers=HASH_WORKERS, rounds=BCRYPT_ROUNDS):
+    """bcrypt hashes of ``passwords``, in order, computed by a process pool."""
+    passwords = list(passwords)
+    workers = min(workers, len(passwords))
+    if workers <= 1:
+        return [hash_password(password, rounds) for password in passwords]
+    # spawn, forking a server process with live threads is not safe
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        chunksize = -(-len(passwords) // (4 * workers))
+        return list(pool.map(hash_password, passwords, [rounds] * len(passwords), chunksize=chunksize))
+
+
+class UserStore:
+    """The ``users`` table of ``path``, one connection shared by the process's threads."""
+
+    def __init__(self, path=USERS_DB):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        # writes through this connection, data_version only counts the other ones
+        self._writes = 0
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            # readers (the app) are not blocked while provisioning writes
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM users").fetchone()[0]
+
+    def usernames(self):
+        with self._lock:
+            return [username for username, in self._conn.execute("SELECT username FROM users ORDER BY username")]
+
+    def add_users(self, users):
+        """Insert or update ``(username, name, hashed password)`` rows in one transaction."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO users (username, name, password) VALUES (?, ?, ?) "
+                "ON CONFLICT (username) DO UPDATE SET name = excluded.name, password = excluded.password",
+                users,
+            )
+            self._writes += 1
+
+    def provision(self, users, workers=HASH_WORKERS, rounds=BCRYPT_ROUNDS):
+        """Hash and store ``(username, name, plain password)`` rows."""
+        users = list(users)
+        hashed = hash_passwords((password for _, _, password in users), workers, rounds)
+        self.add_users((username, name, pw) for (username, name, _), pw in zip(users, hashed))
+        return len(users)
+
+    def import_pickle(self, pickle_path=LEGACY_PICKLE, users=LEGACY_USERS):
+        """Store the hashes of ``generate_keys.py``'s pickle, zipped with ``(username, name)``."""
+        with open(pickle_path, "rb") as f:
+            hashed = pickle.load(f)
+        self.add_users((username, name, pw) for (username, name), pw in zip(users, hashed))
+
+    def version(self):
+        """Changes whenever users are written, by this store or another process."""
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0], self._writes
+
+    def credentials(self):
+        """``streamlit_authenticator`` credentials of every user, read in one query.
+
+        Usernames are lower-cased as ``Authenticate`` does, the passwords are
+        the stored bcrypt hashes (``auto_hash=False``).
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT username, name, password FROM users").fetchall()
+        return {
+            "usernames": {
+                username.lower(): {"name": name, "password": password} for username, name, password in rows
+            }
+        }
+
+
+def load_user_store(path=USERS_DB, pickle_path=LEGACY_PICKLE):
+    """The store at ``path``, seeded from the legacy pickle when it is empty."""
+    store = UserStore(path)
+    if not len(store) and Path(pickle_path).exists():
+        store.import_pickle(pickle_path)
+    return store
+
+
+def read_users_csv(path):
+    with open(path, newline="") as f:
+        return [(row["username"], row["name"], row["password"]) for row in csv.DictReader(f)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=USERS_DB, help="SQLite file of the store")
+    commands = parser.add_subparsers(dest="command", required=True)
+    provision = commands.add_parser("provision", help="add or update users from a username,name,password CSV")
+    provision.add_argument("csv")
+    provision.add_argument("--workers", type=int, default=HASH_WORKERS)
+    provision.add_argument("--rounds", type=int, default=BCRYPT_ROUNDS)
+    commands.add_parser("list", help="print the usernames")
+    args = parser.parse_args(argv)
+
+    store = UserStore(args.db)
+    if args.command == "provision":
+        count = store.provision(read_users_csv(args.csv), args.workers, args.rounds)
+        print(f"{count} users provisioned in {store.path}", file=sys.stderr)
+    elif args.command == "list":
+        for username in store.usernames():
+            print(username)
+
+
+if __name__ == "__main__":
+    main()